@@ -1,68 +1,165 @@
+from backend.utils.startup import StartupTimer, Lazy, DeferredRotatingFileHandler
+startup_timer = StartupTimer()
+
 import os
-import httpx
+import asyncio
 import logging
-import time
 import json
 import uuid
-import random
-from logging.handlers import RotatingFileHandler
+from contextlib import aclosing, asynccontextmanager
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
-from typing import List, Dict, Tuple, Optional
+from typing import AsyncGenerator, AsyncIterator, List, Dict, Optional, Tuple
 
 # Import the models
-from backend.model.models import UserPreferences, Event, OutingPlan, RegenerateRequest
+from backend.model.models import UserPreferences, Event, OutingPlan, RegenerateRequest, BatchRegenerateRequest
 
 # --- Local data dictionary ---
-from backend.utils.popular_spots import PopularSpots
-
+from backend.utils.spot_catalog import classify_category, interest_categories, normalize_name
+from backend.utils.snapshot import DEFAULT_SNAPSHOT_DIR, IMAGES_FILE, load_spot_catalog
+
+# --- Shared outbound HTTP clients ---
+from backend.utils.http_clients import UpstreamClients
+from backend.utils.image_resolver import ImageResolver
+from backend.utils.image_store import ImageCacheStore
+from backend.utils.learned_spots import LearnedSpotStore
+from backend.utils.cache import create_cache_backend, sweep_periodically
+from backend.utils.cache_keys import CacheKeyBuilder, LookupStats, canonical_preferences, parse_budget_bands
+from backend.utils.cache_warmer import CacheWarmer, PreferenceTracker, preferences_from_log_file
+from backend.utils.single_flight import SingleFlight
+from backend.utils.json_stream import JsonArrayStreamParser
+from backend.utils.replacement_pool import ReplacementPool
+from backend.utils.resilience import CircuitBreaker, ResilientCaller
+from backend.utils.metrics import MetricsRegistry
+from backend.utils.prompt_builder import Prompt, PromptBuilder
+from backend.utils.log_pipeline import SAMPLED, JsonFormatter, LogPipeline, Payload, bind_outing_id, outing_scope
+startup_timer.mark("imports")
+
+# --- Startup Configuration ---
+# "lazy" (default) builds the catalog, planner, HTTP clients and log file on first use, which
+# keeps serverless cold starts short. "eager" warms them in the lifespan before serving.
+STARTUP_MODE = os.getenv("STARTUP_MODE", "lazy")
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", DEFAULT_SNAPSHOT_DIR)
 
 # --- Cache and Limit Configuration ---
-api_cache: Dict[str, Tuple[OutingPlan, float]] = {}
-image_cache: Dict[str, str] = {}
 CACHE_TTL_SECONDS = 86400
-regeneration_counts: Dict[str, int] = {}
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "86400"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1000"))
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "50000"))
+CACHE_SWEEP_INTERVAL_SECONDS = float(os.getenv("CACHE_SWEEP_INTERVAL_SECONDS", "60"))
+api_cache = create_cache_backend("plans", CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS)
+# Prefetched replacement candidates get their own bound so they never evict cached plans.
+CANDIDATE_CACHE_MAX_ENTRIES = int(os.getenv("CANDIDATE_CACHE_MAX_ENTRIES", "1000"))
+candidate_cache = create_cache_backend("candidates", CANDIDATE_CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS)
+regeneration_counts = create_cache_backend("regenerations", SESSION_MAX_ENTRIES, SESSION_TTL_SECONDS)
 MAX_REGENERATIONS = 5
+# Budgets are bucketed into bands (upper edges, comma-separated) for plan and regeneration keys.
+cache_keys = CacheKeyBuilder(parse_budget_bands(os.getenv("BUDGET_BANDS")))
+cache_lookups = LookupStats(["plan", "regeneration"])
 LOCAL_REGEN_LIMIT = 3
 
-# --- Persistent Image Cache Setup ---
-IMAGE_CACHE_FILE = "/tmp/learned_images.json"
+# --- Cache Warming ---
+# Keeps plans for the most requested preference combinations cached, regenerating them before
+# they expire. 0 disables the background task; `python -m backend.utils.cache_warmer` warms offline.
+CACHE_WARM_INTERVAL_SECONDS = float(os.getenv("CACHE_WARM_INTERVAL_SECONDS", "0"))
+CACHE_WARM_TOP = int(os.getenv("CACHE_WARM_TOP", "20"))
+# App log to learn popular combinations from when the task starts (e.g. /tmp/logs/app.log).
+CACHE_WARM_LOG_FILE = os.getenv("CACHE_WARM_LOG_FILE")
+preference_tracker = PreferenceTracker(cache_keys)
+
+# --- Plan Source Configuration ---
+# "llm-first" always asks Gemini and uses the local planner as a fallback.
+# "local-first" serves the local plan directly when its score clears the threshold.
+PLAN_STRATEGY = os.getenv("PLAN_STRATEGY", "llm-first")
+LOCAL_FIRST_SCORE_THRESHOLD = float(os.getenv("LOCAL_FIRST_SCORE_THRESHOLD", "0.75"))
 
-def load_image_cache():
-    if os.path.exists(IMAGE_CACHE_FILE):
-        with open(IMAGE_CACHE_FILE, 'r') as f:
-            try:
-                return json.load(f)
-            except json.JSONDecodeError:
-                return {}
-    return {}
+# --- Persistent Image Cache Setup ---
+IMAGE_CACHE_FILE = os.getenv("IMAGE_CACHE_FILE", "/tmp/learned_images.db")
+LEGACY_IMAGE_CACHE_FILE = "/tmp/learned_images.json"
 
-def save_image_cache():
-    with open(IMAGE_CACHE_FILE, 'w') as f:
-        json.dump(image_cache, f, indent=2)
+image_cache = ImageCacheStore(IMAGE_CACHE_FILE, legacy_json_path=LEGACY_IMAGE_CACHE_FILE, seed_path=os.path.join(SNAPSHOT_DIR, IMAGES_FILE))
 
-image_cache = load_image_cache()
+# --- Shared Learned-Spot Catalog ---
+# Venues learned from LLM plans, shared by all workers and kept across cold starts.
+# LEARNED_SPOTS_MAX bounds the database (and so each cold start), not the catalogs of running workers.
+LEARNED_SPOTS_FILE = os.getenv("LEARNED_SPOTS_FILE", "/tmp/learned_spots.db")
+LEARNED_SPOTS_SYNC_INTERVAL_SECONDS = float(os.getenv("LEARNED_SPOTS_SYNC_INTERVAL_SECONDS", "30"))
+learned_spots = LearnedSpotStore(LEARNED_SPOTS_FILE, max_spots=int(os.getenv("LEARNED_SPOTS_MAX", "5000")))
 
 # Configure Logging
+# Request handlers only enqueue records; a background thread formats them and writes the file
+# and console. LOG_FORMAT "json" (default) writes one JSON object per line with the outing_id.
 log_directory = "/tmp/logs"
-if not os.path.exists(log_directory):
-    os.makedirs(log_directory)
-log_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+log_formatter = JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
 log_file = os.path.join(log_directory, 'app.log')
-file_handler = RotatingFileHandler(log_file, maxBytes=5*1024*1024, backupCount=5)
+file_handler = DeferredRotatingFileHandler(log_file, maxBytes=5*1024*1024, backupCount=5)
 file_handler.setFormatter(log_formatter)
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
-if logger.hasHandlers():
-    logger.handlers.clear()
-logger.addHandler(file_handler)
 console_handler = logging.StreamHandler()
 console_handler.setFormatter(log_formatter)
-logger.addHandler(console_handler)
+log_pipeline = LogPipeline(
+    [file_handler, console_handler],
+    queue_size=int(os.getenv("LOG_QUEUE_SIZE", "10000")),
+    # Share of raw LLM responses that are logged at all, and how much of each.
+    payload_sample_rate=float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0.1")),
+    payload_max_chars=int(os.getenv("LOG_PAYLOAD_MAX_CHARS", "500")),
+)
+log_pipeline.install(logging.getLogger(), os.getenv("LOG_LEVEL", "INFO").upper())
 
 load_dotenv()
-app = FastAPI()
+upstream_clients = UpstreamClients()
+metrics = MetricsRegistry()
+PROMPT_TOKEN_BUCKETS = (100, 200, 300, 400, 500, 750, 1000, 1500, 2000, 4000)
+prompt_tokens = metrics.histogram("onestop_llm_prompt_tokens", "Estimated input tokens per Gemini prompt by kind.", PROMPT_TOKEN_BUCKETS)
+llm_fallbacks = metrics.counter("onestop_llm_fallback_total", "LLM calls that failed and fell back to local data.")
+excluded_venues = metrics.counter("onestop_llm_excluded_venues_total", "Known or duplicate venues the LLM returned anyway.")
+plan_sources = metrics.counter("onestop_plan_source_total", "Plans generated by source (llm, local_first, fallback).")
+regeneration_sources = metrics.counter("onestop_regeneration_source_total", "Regenerated events by source (cache, pool, local, llm).")
+
+# --- Resilience around the LLM calls ---
+# Interactive calls fall back to local data once LLM_DEADLINE_SECONDS is spent;
+# background prefetches can wait longer.
+GEMINI_MODEL = "gemini-2.0-flash"
+PREFETCH_DEADLINE_SECONDS = float(os.getenv("PREFETCH_DEADLINE_SECONDS", "20"))
+llm_guard = ResilientCaller(
+    "gemini",
+    deadline_seconds=float(os.getenv("LLM_DEADLINE_SECONDS", "8")),
+    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "16")),
+    max_queue=int(os.getenv("LLM_MAX_QUEUE", "64")),
+    breaker=CircuitBreaker(
+        failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+        reset_timeout_seconds=float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30")),
+    ),
+    hedging=os.getenv("LLM_HEDGING", "false").lower() == "true",
+)
+startup_timer.mark("configuration")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if STARTUP_MODE == "eager":
+        local_planner.get()
+        upstream_clients.start()
+    sweeper = asyncio.create_task(sweep_periodically([api_cache, candidate_cache, regeneration_counts, learned_spots], CACHE_SWEEP_INTERVAL_SECONDS))
+    learned_syncer = asyncio.create_task(sync_learned_spots_periodically())
+    cache_warming = asyncio.create_task(warm_cache_periodically()) if CACHE_WARM_INTERVAL_SECONDS > 0 else None
+    yield
+    sweeper.cancel()
+    learned_syncer.cancel()
+    if cache_warming:
+        cache_warming.cancel()
+    await replacement_pool.aclose()
+    for flight in (plan_flight, candidate_flight, image_resolver):
+        await flight.aclose()
+    await upstream_clients.aclose()
+    await image_cache.aclose()
+    await learned_spots.aclose()
+    api_cache.close()
+    candidate_cache.close()
+    regeneration_counts.close()
+
+app = FastAPI(lifespan=lifespan)
 
 # --- UPDATED: Dynamic CORS Middleware ---
 # This will work for both local development and your Vercel deployment.
@@ -84,287 +181,677 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+startup_timer.mark("app")
+
+# --- Indexed local spot catalog ---
+def build_spot_catalog():
+    catalog = load_spot_catalog(SNAPSHOT_DIR)
+    learned_spots.load_into(catalog)
+    return catalog
 
-# --- Helper to get all popular spot names ---
-def get_all_popular_spot_names():
-    names = set()
-    for category in PopularSpots.spots.values():
-        for spot in category:
-            names.add(spot['name'])
-    return list(names)
+def build_local_planner():
+    # Imported here so NumPy loads on first use rather than on every cold start.
+    from backend.utils.local_planner import LocalPlanner
+    return LocalPlanner(spot_catalog)
 
-all_popular_names = get_all_popular_spot_names()
+spot_catalog = Lazy("spot catalog", build_spot_catalog, startup_timer)
+local_planner = Lazy("local planner", build_local_planner, startup_timer)
+
+# --- Prompt construction ---
+# Exclusion lists are capped at PROMPT_EXCLUSION_TOKEN_BUDGET (estimated tokens) so prompt size
+# stays flat as the catalog grows; model output is post-filtered against the full catalog.
+prompt_builder = PromptBuilder(spot_catalog, max_exclusion_tokens=int(os.getenv("PROMPT_EXCLUSION_TOKEN_BUDGET", "400")))
 
 
 # --- Helper to dynamically add events to the local dictionary ---
 def add_event_to_local_dictionary(event: Event):
-    logging.info(f"Checking if '{event.name}' can be added to local dictionary.")
-    category = "Activity"
-    if "museum" in event.type.lower(): category = "Museum"
-    elif "pub" in event.type.lower(): category = "Pub"
-    elif any(food_type in event.type.lower() for food_type in ["food", "lunch", "dinner", "breakfast", "treat"]): category = "Food"
-
-    if category in PopularSpots.spots:
-        if not any(spot['name'].lower() == event.name.lower() for spot in PopularSpots.spots[category]):
-            new_spot = {
-                "type": event.type,
-                "name": event.name,
-                "cost": event.cost,
-                "duration": event.duration,
-                "image_url": event.image_url
-            }
-            PopularSpots.spots[category].append(new_spot)
-            logging.info(f"Successfully added '{event.name}' with its image to the '{category}' category in local data.")
+    logging.info("Checking if '%s' can be added to local dictionary.", event.name)
+    category = classify_category(event.type)
+
+    if spot_catalog.has_category(category):
+        new_spot = {
+            "type": event.type,
+            "name": event.name,
+            "cost": event.cost,
+            "duration": event.duration,
+            "image_url": event.image_url
+        }
+        if spot_catalog.add(category, new_spot, learned=True):
+            learned_spots.record(category, new_spot)
+            learned_spots.schedule_flush()
+            logging.info("Successfully added '%s' with its image to the '%s' category in local data.", event.name, category)
         else:
-            logging.info(f"'{event.name}' already exists in local data. Skipping addition.")
+            logging.info("'%s' already exists in local data. Skipping addition.", event.name)
     else:
-        logging.warning(f"Category '{category}' not found in local data for event '{event.name}'. Cannot add.")
+        logging.warning("Category '%s' not found in local data for event '%s'. Cannot add.", category, event.name)
+
+
+async def sync_learned_spots_periodically():
+    """Background task that picks up spots other workers have learned."""
+    while True:
+        await asyncio.sleep(LEARNED_SPOTS_SYNC_INTERVAL_SECONDS)
+        if not spot_catalog.loaded:
+            continue
+        try:
+            added = await learned_spots.refresh(spot_catalog.get())
+            if added:
+                logging.info("Synced %d learned spots from other workers.", added)
+        except Exception as e:
+            logging.error("Learned spot sync failed. Error: %s", e)
 
 
 # --- Function to get and cache images ---
-async def get_image_for_event(event_name: str) -> str:
-    if event_name in image_cache:
-        logging.info(f"IMAGE CACHE HIT for: {event_name}")
-        return image_cache[event_name]
-    
-    logging.info(f"IMAGE CACHE MISS for: {event_name}. Fetching from Pexels.")
+async def fetch_image_from_pexels(event_name: str) -> Optional[str]:
     pexels_api_key = os.getenv("PEXELS_API_KEY")
     if not pexels_api_key:
         logging.warning("PEXELS_API_KEY not found. Cannot fetch images.")
-        return ""
+        return None
 
     headers = {"Authorization": pexels_api_key}
-    query = f"{event_name} Dublin"
-    url = f"https://api.pexels.com/v1/search?query={query}&per_page=1"
-    
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-            if data['photos']:
-                image_url = data['photos'][0]['src']['tiny']
-                image_cache[event_name] = image_url
-                save_image_cache()
-                return image_url
-    except Exception as e:
-        logging.error(f"Failed to fetch image for '{event_name}'. Error: {e}")
-    
-    return ""
+    params = {"query": f"{event_name} Dublin", "per_page": 1}
+    response = await upstream_clients.pexels.client.get("/v1/search", params=params, headers=headers)
+    response.raise_for_status()
+    data = response.json()
+    if data['photos']:
+        return data['photos'][0]['src']['tiny']
+    return None
+
+image_resolver = ImageResolver(
+    fetch=fetch_image_from_pexels,
+    cache=image_cache,
+    persist=image_cache.schedule_flush,
+    max_concurrency=int(os.getenv("IMAGE_FETCH_CONCURRENCY", "4")),
+    negative_ttl_seconds=float(os.getenv("IMAGE_NEGATIVE_TTL_SECONDS", "600")),
+    max_negative_entries=int(os.getenv("IMAGE_NEGATIVE_MAX_ENTRIES", "10000")),
+)
+
+async def get_image_for_event(event_name: str) -> str:
+    return await image_resolver.resolve(event_name)
 
 
 # --- LLM and Helper Functions ---
 
-async def generate_plan_with_llm(preferences: UserPreferences):
+def get_google_api_key() -> str:
     api_key = os.getenv("GOOGLE_API_KEY")
     if not api_key:
         logging.error("GOOGLE_API_KEY not found.")
         raise HTTPException(status_code=500, detail="Google API key not found.")
-    api_url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={api_key}"
-    mode_instruction = "Focus on quirky, offbeat gems." if preferences.mode == 'surprise' else "Focus on iconic, popular landmarks."
-    
-    prompt = f"""
-    You are a Dublin tour planner API. Your entire response must be only the raw JSON text.
-    Plan a 3-event day in Dublin based on these user preferences:
-    - Mode: {preferences.mode}
-    - Budget: {preferences.budget}
-    - Interests: {', '.join(preferences.interests)}
-    Instruction: {mode_instruction}
-    CRITICAL INSTRUCTION: Do not suggest any of the following well-known places: {', '.join(all_popular_names)}.
-    IMPORTANT: Respond with ONLY a valid JSON array of objects, with no introductory text, no markdown, and no explanations.
-    Example format:
-    [
-        {{"type": "Breakfast", "name": "The Early Bird Café", "cost": 15, "duration": 60}},
-        {{"type": "Activity", "name": "A lesser-known gallery", "cost": 0, "duration": 120}},
-        {{"type": "Lunch", "name": "A unique food market", "cost": 25, "duration": 75}}
-    ]
+    return api_key
+
+def report_prompt(prompt: Prompt):
+    """Logs and records the size of every prompt sent to Gemini."""
+    stats = prompt.stats()
+    logging.info("Gemini %s prompt: %d chars, ~%d tokens, %d/%d exclusions.", prompt.kind, stats['chars'], stats['estimated_tokens'], stats['exclusions'], stats['exclusions_available'])
+    prompt_tokens.observe(prompt.estimated_tokens, kind=prompt.kind)
+
+def replace_excluded_event(event: Event, others: List[Event], route: str, max_cost: int) -> Event:
     """
-    payload = {"contents": [{"parts": [{"text": prompt}]}]}
-    async with httpx.AsyncClient() as client:
-        logging.info("Sending request to Gemini API for a full plan.")
-        response = await client.post(api_url, json=payload, timeout=30.0)
+    Swaps a venue the model returned despite the exclusion list for an unused local spot of the
+    same category costing at most `max_cost`; raises ValueError when no such spot exists.
+    """
+    if not prompt_builder.is_excluded(event.name, others):
+        return event
+    excluded_venues.inc(route=route)
+    local_choice = spot_catalog.random_choice(classify_category(event.type), exclude=[event.name] + [other.name for other in others], max_cost=max_cost)
+    if not local_choice:
+        raise ValueError(f"No local spot within {max_cost} to replace excluded venue '{event.name}'.")
+    logging.info("LLM returned excluded venue '%s', replacing it with '%s'.", event.name, local_choice['name'])
+    return Event(**local_choice)
+
+def replace_excluded_events(events: List[Event], route: str, budget: int) -> List[Event]:
+    """Replaces excluded venues so that each swap keeps the plan within `budget`."""
+    kept: List[Event] = []
+    for index, event in enumerate(events):
+        others_cost = sum(other.cost for other in kept) + sum(other.cost for other in events[index + 1:])
+        kept.append(replace_excluded_event(event, kept, route, max_cost=budget - others_cost))
+    return kept
+
+async def post_to_gemini(api_url: str, payload: dict, deadline_seconds: Optional[float] = None) -> dict:
+    """POSTs to Gemini under the deadline, circuit breaker, concurrency limit and hedging of llm_guard."""
+    async def attempt() -> dict:
+        response = await upstream_clients.gemini.client.post(api_url, json=payload)
         response.raise_for_status()
-        result = response.json()
-        if result.get('candidates'):
-            llm_response = result['candidates'][0]['content']['parts'][0]['text']
-            logging.info(f"LLM Response: {llm_response}")
-            return llm_response
-        else:
-            logging.error(f"Unexpected API response structure: {result}")
-            raise HTTPException(status_code=500, detail="Could not parse LLM response.")
+        return response.json()
+    return await llm_guard.call(attempt, deadline_seconds=deadline_seconds)
+
+def gemini_url(method: str, query: str = "") -> str:
+    return f"/v1beta/models/{GEMINI_MODEL}:{method}?{query}key={get_google_api_key()}"
+
+async def call_gemini_json(prompt: Prompt, route: str, deadline_seconds: Optional[float] = None):
+    """
+    Sends a prompt to Gemini's generateContent and returns the JSON the model answered with,
+    stripped of Markdown code fences. Raises ValueError when the response has no candidates.
+    """
+    report_prompt(prompt)
+    logging.info("Sending %s request to Gemini API.", prompt.kind)
+    with metrics.stage(route, "llm_call"):
+        result = await post_to_gemini(gemini_url("generateContent"), prompt.payload(), deadline_seconds=deadline_seconds)
+    if not result.get('candidates'):
+        logging.error("Unexpected API response structure: %s", Payload(result))
+        raise ValueError("LLM response did not contain candidates.")
+    llm_response = result['candidates'][0]['content']['parts'][0]['text']
+    logging.info("LLM %s response: %s", prompt.kind, Payload(llm_response), extra=SAMPLED)
+    with metrics.stage(route, "response_parse"):
+        return json.loads(llm_response.strip().replace("```json", "").replace("```", "").strip())
+
+def stream_plan_with_llm(preferences: UserPreferences) -> AsyncGenerator[str, None]:
+    """
+    Yields text chunks of the plan as Gemini's streamGenerateContent (SSE) produces them, under
+    llm_guard; the stream raises DeadlineExceededError once the LLM deadline is spent.
+    """
+    api_url = gemini_url("streamGenerateContent", "alt=sse&")
+    prompt = prompt_builder.plan_prompt(preferences)
+    report_prompt(prompt)
+    logging.info("Sending streaming request to Gemini API for a full plan.")
+
+    async def read_chunks() -> AsyncGenerator[str, None]:
+        async with upstream_clients.gemini.client.stream("POST", api_url, json=prompt.payload()) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                chunk = json.loads(line[len("data:"):])
+                for candidate in chunk.get('candidates', [])[:1]:
+                    for part in candidate.get('content', {}).get('parts', []):
+                        if part.get('text'):
+                            yield part['text']
+
+    return llm_guard.stream(read_chunks)
 
 async def get_llm_replacement_event(request: RegenerateRequest) -> Event:
     try:
         logging.info("Attempting to get replacement from LLM first.")
-        api_key = os.getenv("GOOGLE_API_KEY")
-        if not api_key:
-            raise ValueError("API Key not found")
-        api_url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={api_key}"
-        mode_instruction = "Suggest a quirky, offbeat alternative." if request.user_preferences.mode == 'surprise' else "Suggest an iconic or popular alternative."
-        
-        existing_event_names = {event.name for event in request.current_plan}
-        exclusion_list = list(existing_event_names.union(set(all_popular_names)))
-
-        prompt = f"""
-        You are a Dublin tour planner API. Your entire response must be only the raw JSON text.
-        A user wants to replace one event in their plan.
-        - Event to Replace: "{request.current_plan[request.event_index_to_replace].name}"
-        - User Interests: {', '.join(request.user_preferences.interests)}
-        - Planning Mode: {request.user_preferences.mode}
-        Instruction: {mode_instruction}
-        CRITICAL INSTRUCTION: The new event must not be in the following list: {', '.join(exclusion_list)}.
-        IMPORTANT: Respond with ONLY a single valid JSON object, with no introductory text, no markdown, and no explanations.
-        Example format:
-        {{"type": "Pub", "name": "A hidden local pub", "cost": 20, "duration": 90}}
-        """
-        payload = {"contents": [{"parts": [{"text": prompt}]}]}
-        async with httpx.AsyncClient() as client:
-            response = await client.post(api_url, json=payload, timeout=30.0)
-            response.raise_for_status()
-            result = response.json()
-            if result.get('candidates'):
-                llm_response = result['candidates'][0]['content']['parts'][0]['text']
-                logging.info(f"LLM Replacement Response: {llm_response}")
-                cleaned_response = llm_response.strip().replace("```json", "").replace("```", "").strip()
-                new_event_data = json.loads(cleaned_response)
-                new_event = Event(**new_event_data)
-                return new_event
-            else:
-                raise ValueError("LLM response did not contain candidates.")
+        prompt = prompt_builder.replacement_prompt(request.current_plan, request.event_index_to_replace, request.user_preferences)
+        new_event_data = await call_gemini_json(prompt, "regenerate")
+        with metrics.stage("regenerate", "event_validation"):
+            new_event = Event(**new_event_data)
+            if prompt_builder.is_excluded(new_event.name, request.current_plan):
+                excluded_venues.inc(route="regenerate")
+                raise ValueError(f"LLM suggested excluded venue '{new_event.name}'.")
+        return new_event
     except Exception as e:
-        logging.warning(f"LLM call failed for regeneration, attempting local fallback. Error: {e}")
+        logging.warning("LLM call failed for regeneration, attempting local fallback. Error: %s", e)
+        llm_fallbacks.inc(route="regenerate")
         return get_local_replacement_event(request)
 
 def get_local_replacement_event(request: RegenerateRequest) -> Optional[Event]:
     logging.info("Attempting to find a replacement from local data.")
     event_to_replace = request.current_plan[request.event_index_to_replace]
-    category = "Activity"
-    if "museum" in event_to_replace.type.lower(): category = "Museum"
-    elif "pub" in event_to_replace.type.lower(): category = "Pub"
-    elif any(food_type in event_to_replace.type.lower() for food_type in ["food", "lunch", "dinner", "breakfast"]): category = "Food"
+    category = classify_category(event_to_replace.type)
     
-    potential_replacements = PopularSpots.spots.get(category, [])
     existing_names = {e.name for e in request.current_plan}
-    valid_choices = [spot for spot in potential_replacements if spot["name"] not in existing_names]
+    local_choice = spot_catalog.random_choice(category, exclude=existing_names)
     
-    if valid_choices:
-        logging.info(f"Found {len(valid_choices)} local candidates for replacement.")
-        local_choice = random.choice(valid_choices)
+    if local_choice:
+        logging.info("Found local replacement '%s' in '%s'.", local_choice['name'], category)
         return Event(**local_choice)
     else:
         logging.warning("No suitable local replacement found.")
         return None
 
+async def get_llm_replacement_candidates(plan: List[Event], preferences: UserPreferences, per_slot: int) -> Dict[int, List[Event]]:
+    prompt = prompt_builder.candidates_prompt(plan, preferences, per_slot)
+    slots = await call_gemini_json(prompt, "prefetch", deadline_seconds=PREFETCH_DEADLINE_SECONDS)
+    return {index: [Event(**data) for data in alternatives] for index, alternatives in enumerate(slots[:len(plan)])}
 
-# --- API Endpoints ---
+async def get_llm_batch_replacements(plan: List[Event], indices: List[int], preferences: UserPreferences) -> Dict[int, Event]:
+    """Asks Gemini for one replacement per index in a single call."""
+    prompt = prompt_builder.batch_replacement_prompt(plan, indices, preferences)
+    events_data = await call_gemini_json(prompt, "regenerate_batch")
+    return {index: Event(**data) for index, data in zip(indices, events_data)}
 
-@app.post("/api/plan", response_model=OutingPlan)
-async def create_outing_plan(preferences: UserPreferences):
-    logging.info(f"Creating outing plan with preferences: {preferences}")
-    cache_key = f"plan-{preferences.mode}-{preferences.budget}-{'-'.join(sorted(preferences.interests))}"
-    if cache_key in api_cache:
-        cached_plan_data, timestamp = api_cache[cache_key]
-        if time.time() - timestamp < CACHE_TTL_SECONDS:
-            logging.info(f"CACHE HIT for key: {cache_key}")
-            outing_id = str(uuid.uuid4())
-            regeneration_counts[outing_id] = 0
-            new_session_plan = OutingPlan(plan=cached_plan_data.plan, total_cost=cached_plan_data.total_cost, total_duration=cached_plan_data.total_duration, outing_id=outing_id)
-            return new_session_plan
-        else:
-            logging.info(f"CACHE EXPIRED for key: {cache_key}")
-            del api_cache[cache_key]
-    
-    logging.info(f"Received /plan request with preferences: {preferences}")
-    
+candidate_flight = SingleFlight()
+
+async def build_replacement_candidates(plan: List[Event], preferences: UserPreferences, per_slot: int, use_llm: bool) -> Dict[int, List[Event]]:
+    """
+    Gets per-slot alternatives from one LLM call (only if `use_llm`), tops up from the local
+    catalog and resolves their images.
+    """
+    candidates: Dict[int, List[Event]] = {}
+    if use_llm:
+        try:
+            candidates = await get_llm_replacement_candidates(plan, preferences, per_slot)
+        except Exception as e:
+            logging.warning("LLM call failed while prefetching replacements, using local data. Error: %s", e)
+
+    used_names = {event.name for event in plan}
+    slots: Dict[int, List[Event]] = {}
+    for index, event in enumerate(plan):
+        slot = []
+        for candidate in candidates.get(index, []):
+            if len(slot) < per_slot and not prompt_builder.is_excluded(candidate.name) and candidate.name not in used_names:
+                slot.append(candidate)
+                used_names.add(candidate.name)
+        while len(slot) < per_slot:
+            local_choice = spot_catalog.random_choice(classify_category(event.type), exclude=used_names)
+            if not local_choice:
+                break
+            slot.append(Event(**local_choice))
+            used_names.add(local_choice["name"])
+        slots[index] = slot
+
+    await image_resolver.fill_event_images([candidate for slot in slots.values() for candidate in slot])
+    return slots
+
+async def fetch_replacement_candidates(plan: List[Event], preferences: UserPreferences, per_slot: int, use_llm: bool) -> Dict[int, List[Event]]:
+    if not use_llm:
+        # Local plans are jittered and rarely repeat, so their candidates are not worth caching.
+        return await build_replacement_candidates(plan, preferences, per_slot, use_llm=False)
+
+    # Identical LLM plans (e.g. served from the plan cache) share one set of candidates.
+    cache_key = f"candidates-{plan_cache_key(preferences)}-{'|'.join(event.name for event in plan)}"
+    cached_slots = candidate_cache.get(cache_key)
+    if cached_slots is not None:
+        return {int(index): [Event(**data) for data in slot] for index, slot in cached_slots.items()}
+
+    slots = await candidate_flight.do(cache_key, lambda: build_replacement_candidates(plan, preferences, per_slot, use_llm=True))
+    await candidate_cache.aset(cache_key, {str(index): [event.model_dump(mode="json") for event in slot] for index, slot in slots.items()})
+    return slots
+
+replacement_pool = ReplacementPool(
+    fetch_candidates=fetch_replacement_candidates,
+    per_slot=min(int(os.getenv("REPLACEMENT_POOL_PER_SLOT", "3")), MAX_REGENERATIONS),
+    ttl_seconds=float(os.getenv("REPLACEMENT_POOL_TTL_SECONDS", "1800")),
+    max_sessions=int(os.getenv("REPLACEMENT_POOL_MAX_SESSIONS", "1000")),
+)
+
+
+# --- Plan generation shared by coalesced requests ---
+def plan_cache_key(preferences: UserPreferences) -> str:
+    return cache_keys.plan_key(canonical_preferences(preferences))
+
+def lookup_cached_plan(cache_key: str, preferences: UserPreferences) -> Optional[dict]:
+    """Returns the plan cached for the budget band only if it also fits this exact budget."""
+    plan_data = api_cache.get(cache_key)
+    if plan_data is None:
+        cache_lookups.record("plan", "miss")
+        return None
+    if not cache_keys.plan_fits(plan_data, preferences):
+        logging.info("Cached plan for %s costs %s, over budget %s.", cache_key, plan_data['total_cost'], preferences.budget)
+        cache_lookups.record("plan", "stale")
+        return None
+    cache_lookups.record("plan", "hit")
+    return plan_data
+
+def record_spot_usage(events: List[Event]):
+    """Counts each served learned spot so the store trims the least used ones first."""
+    for event in events:
+        if spot_catalog.is_learned(event.name):
+            learned_spots.record_use(classify_category(event.type), event.model_dump(mode="json"))
+    learned_spots.schedule_flush()
+
+def start_session(plan_data: dict) -> OutingPlan:
+    """Gives a plan its outing id; its regeneration count starts at 0 because missing keys read as 0."""
+    outing_id = str(uuid.uuid4())
+    bind_outing_id(outing_id)
+    final_plan = OutingPlan(**{**plan_data, "outing_id": outing_id})
+    record_spot_usage(final_plan.plan)
+    return final_plan
+
+plan_flight = SingleFlight()
+
+async def generate_plan(preferences: UserPreferences, cache_key: str) -> Tuple[dict, bool]:
+    """
+    Produces a plan without a session id (LLM, local-first or local fallback) and caches LLM plans.
+    Returns the plan data and whether it came from the LLM.
+    Runs once per cache_key no matter how many identical requests are in flight.
+    """
     parsed_events = None
     is_llm_plan = False
-    try:
-        llm_text_response = await generate_plan_with_llm(preferences)
-        cleaned_response = llm_text_response.strip().replace("```json", "").replace("```", "").strip()
-        events_data = json.loads(cleaned_response)
-        parsed_events = [Event(**data) for data in events_data]
-        is_llm_plan = True
-    except Exception as e:
-        logging.error(f"LLM call failed for new plan, attempting local fallback. Error: {e}", exc_info=True)
+    plan_source = "llm"
+    if PLAN_STRATEGY == "local-first":
+        with metrics.stage("plan", "local_plan"):
+            local_plan = local_planner.plan(preferences)
+        if local_plan and local_plan.score >= LOCAL_FIRST_SCORE_THRESHOLD:
+            logging.info("Serving local-first plan with score %s.", local_plan.score)
+            parsed_events = [Event(**spot) for spot in local_plan.spots]
+            plan_source = "local_first"
+        else:
+            logging.info("Local-first plan score %s below threshold, using LLM.", local_plan.score if local_plan else None)
+
+    if parsed_events is None:
         try:
+            events_data = await call_gemini_json(prompt_builder.plan_prompt(preferences), "plan")
+            with metrics.stage("plan", "event_validation"):
+                parsed_events = replace_excluded_events([Event(**data) for data in events_data], "plan", preferences.budget)
+            is_llm_plan = True
+        except Exception as e:
+            logging.error("LLM call failed for new plan, attempting local fallback. Error: %s", e, exc_info=True)
+            llm_fallbacks.inc(route="plan")
             logging.info("Attempting to generate plan from local data as a fallback.")
-            parsed_events = [
-                Event(**random.choice(PopularSpots.spots["Food"])),
-                Event(**random.choice(PopularSpots.spots["Activity"])),
-                Event(**random.choice(PopularSpots.spots["Museum"])),
-            ]
-            if len({e.name for e in parsed_events}) != 3:
-                 raise ValueError("Duplicate events selected in fallback.")
-        except (KeyError, IndexError, ValueError) as fallback_e:
-             logging.error(f"Local fallback also failed. Error: {fallback_e}")
-             raise HTTPException(status_code=500, detail="Failed to generate plan from any source.")
+            with metrics.stage("plan", "local_plan"):
+                local_plan = local_planner.plan(preferences)
+            if not local_plan:
+                logging.error("Local fallback also failed. No plan fits the preferences.")
+                raise HTTPException(status_code=500, detail="Failed to generate plan from any source.")
+            parsed_events = [Event(**spot) for spot in local_plan.spots]
+            plan_source = "fallback"
 
     if not parsed_events:
         logging.error("Failed to generate a valid plan after all attempts.")
         raise HTTPException(status_code=500, detail="Failed to generate a valid plan.")
     
-    for event in parsed_events:
-        if not event.image_url:
-            event.image_url = await get_image_for_event(event.name)
-        if is_llm_plan:
-            add_event_to_local_dictionary(event)
+    with metrics.stage("plan", "image_resolution"):
+        await image_resolver.fill_event_images(parsed_events)
+    if is_llm_plan:
+        with metrics.stage("plan", "catalog_update"):
+            for event in parsed_events:
+                add_event_to_local_dictionary(event)
 
     total_cost = sum(event.cost for event in parsed_events)
     total_duration = sum(event.duration for event in parsed_events)
-    
-    outing_id = str(uuid.uuid4())
-    regeneration_counts[outing_id] = 0
-    
-    final_plan = OutingPlan(plan=parsed_events, total_cost=total_cost, total_duration=total_duration, outing_id=outing_id)
+    plan_data = OutingPlan(plan=parsed_events, total_cost=total_cost, total_duration=total_duration, outing_id="").model_dump(mode="json")
     
     if is_llm_plan:
-        api_cache[cache_key] = (final_plan, time.time())
-        logging.info(f"Successfully created and cached LLM plan with {len(parsed_events)} events. Outing ID: {outing_id}")
+        await api_cache.aset(cache_key, plan_data)
+        logging.info("Successfully created and cached LLM plan with %d events.", len(parsed_events))
     else:
-        logging.info(f"Successfully created local fallback plan with {len(parsed_events)} events. Outing ID: {outing_id}")
+        logging.info("Successfully created local plan with %d events.", len(parsed_events))
+    plan_sources.inc(source=plan_source)
+    return plan_data, is_llm_plan
+
+async def warm_plan(preferences: UserPreferences) -> bool:
+    """Generates and caches the plan for `preferences`, joining a live request for the same key if one is in flight."""
+    cache_key = plan_cache_key(preferences)
+    expires_before = api_cache.expires_in(cache_key) or 0.0
+    await plan_flight.do(cache_key, lambda: generate_plan(preferences, cache_key))
+    # Only LLM plans are cached; a local fallback leaves the entry as it was.
+    return (api_cache.expires_in(cache_key) or 0.0) > expires_before
+
+cache_warmer = CacheWarmer(
+    warm_plan,
+    api_cache,
+    cache_keys,
+    refresh_margin_seconds=float(os.getenv("CACHE_WARM_REFRESH_MARGIN_SECONDS", "3600")),
+    concurrency=int(os.getenv("CACHE_WARM_CONCURRENCY", "2")),
+    rate_per_second=float(os.getenv("CACHE_WARM_RATE_PER_SECOND", "0.5")),
+)
+
+async def warm_cache_periodically():
+    """Background task that keeps the most requested plans cached and refreshes them before they expire."""
+    if CACHE_WARM_LOG_FILE:
+        try:
+            found = await asyncio.to_thread(preferences_from_log_file, CACHE_WARM_LOG_FILE, preference_tracker)
+            logging.info("Learned %d plan requests from '%s' for cache warming.", found, CACHE_WARM_LOG_FILE)
+        except OSError as e:
+            logging.warning("Could not read cache warming log '%s'. Error: %s", CACHE_WARM_LOG_FILE, e)
+    while True:
+        try:
+            await cache_warmer.warm(preference_tracker.most_common(CACHE_WARM_TOP))
+        except Exception as e:
+            logging.error("Cache warming run failed. Error: %s", e)
+        await asyncio.sleep(CACHE_WARM_INTERVAL_SECONDS)
+
+
+# --- Metrics ---
+def collect_component_metrics():
+    """Exposes the stats the caches, resolver, LLM guard and HTTP clients already keep."""
+    cache_stats = {"plans": api_cache.stats(), "candidates": candidate_cache.stats(), "regenerations": regeneration_counts.stats()}
+    image_stats = image_resolver.stats()
+    image_hits = image_stats["hits"] + image_stats["negative_hits"]
+    image_lookups = image_hits + image_stats["misses"]
+    guard_stats = llm_guard.stats()
+    upstream_stats = upstream_clients.stats()
+    outcomes = {"success": "successes", "failure": "failures", "deadline_exceeded": "deadline_exceeded", "rejected_open": "rejected_open", "rejected_queue_full": "rejected_queue_full"}
+
+    yield ("onestop_cache_requests_total", "counter", "Cache lookups by cache and result.",
+           [({"cache": name, "result": "hit"}, stats["hits"]) for name, stats in cache_stats.items()]
+           + [({"cache": name, "result": "miss"}, stats["misses"]) for name, stats in cache_stats.items()]
+           + [({"cache": "images", "result": "hit"}, image_hits), ({"cache": "images", "result": "miss"}, image_stats["misses"])])
+    yield ("onestop_cache_hit_ratio", "gauge", "Cache hit ratio by cache.",
+           [({"cache": name}, stats["hit_ratio"]) for name, stats in cache_stats.items()]
+           + [({"cache": "images"}, image_hits / image_lookups if image_lookups else 0.0)])
+    yield ("onestop_cache_entries", "gauge", "Entries currently held by cache.", [({"cache": name}, stats["size"]) for name, stats in cache_stats.items()])
+    yield ("onestop_cache_evictions_total", "counter", "Entries evicted by the size bound.", [({"cache": name}, stats["evictions"]) for name, stats in cache_stats.items()])
+    yield ("onestop_image_fetches_coalesced_total", "counter", "Image lookups that joined an in-flight fetch.", [({}, image_stats["coalesced"])])
+    log_stats = log_pipeline.stats()
+    yield ("onestop_log_queue_depth", "gauge", "Log records waiting for the writer thread.", [({}, log_stats["queued"])])
+    yield ("onestop_log_records_skipped_total", "counter", "Log records not written, by reason.", [({"reason": "queue_full"}, log_stats["dropped"]), ({"reason": "sampled_out"}, log_stats["sampled_out"])])
+    warm_stats = cache_warmer.stats()
+    yield ("onestop_cache_warm_plans_total", "counter", "Plans handled by cache warming by result.", [({"result": result}, warm_stats[result]) for result in ("warmed", "skipped", "failed")])
+    yield ("onestop_plan_requests_coalesced_total", "counter", "Plan requests that joined an in-flight generation.", [({}, plan_flight.stats()["coalesced"])])
+    yield ("onestop_llm_circuit_open", "gauge", "1 when the LLM circuit breaker is not closed.", [({}, 0 if guard_stats["circuit_state"] == "closed" else 1)])
+    yield ("onestop_llm_in_flight", "gauge", "LLM calls currently running.", [({}, guard_stats["in_flight"])])
+    yield ("onestop_llm_waiting", "gauge", "LLM calls waiting for a concurrency slot.", [({}, guard_stats["waiting"])])
+    yield ("onestop_llm_calls_total", "counter", "Guarded LLM calls by outcome.", [({"outcome": outcome}, guard_stats[key]) for outcome, key in outcomes.items()])
+    yield ("onestop_llm_hedges_total", "counter", "Hedged LLM attempts fired and won.", [({"result": "fired"}, guard_stats["hedges_fired"]), ({"result": "won"}, guard_stats["hedges_won"])])
+    yield ("onestop_upstream_requests_total", "counter", "Outbound HTTP requests by upstream.", [({"upstream": name}, stats["requests_sent"]) for name, stats in upstream_stats.items()])
+    yield ("onestop_upstream_connections_opened_total", "counter", "New outbound connections by upstream.", [({"upstream": name}, stats["connections_opened"]) for name, stats in upstream_stats.items()])
+    yield ("onestop_cache_key_lookups_total", "counter", "Plan and regeneration cache lookups by result (hit, miss, stale).",
+           [({"cache": name, "result": result}, counts[result]) for name, counts in cache_lookups.stats().items() for result in LookupStats.RESULTS])
+    yield ("onestop_startup_phase_seconds", "gauge", "Time spent in each startup phase and deferred load.", [({"phase": phase}, seconds) for phase, seconds in startup_timer.phases.items()])
+
+metrics.register_collector(collect_component_metrics)
 
+
+# --- API Endpoints ---
+
+@app.post("/api/plan", response_model=OutingPlan)
+async def create_outing_plan(preferences: UserPreferences):
+    with metrics.request("plan"), outing_scope():
+        return await _create_outing_plan(preferences)
+
+async def _create_outing_plan(preferences: UserPreferences) -> OutingPlan:
+    logging.info("Creating outing plan with preferences: %s", preferences)
+    preferences = canonical_preferences(preferences)
+    preference_tracker.record(preferences)
+    cache_key = plan_cache_key(preferences)
+    with metrics.stage("plan", "cache_lookup"):
+        plan_data = lookup_cached_plan(cache_key, preferences)
+    # Only LLM plans are cached.
+    is_llm_plan = plan_data is not None
+    if plan_data is not None:
+        logging.info("CACHE HIT for key: %s", cache_key)
+    else:
+        coalesced = plan_flight.in_flight(cache_key)
+        if coalesced:
+            logging.info("COALESCED /plan request onto in-flight key: %s", cache_key)
+        else:
+            logging.info("Received /plan request with preferences: %s", preferences)
+        plan_data, is_llm_plan = await plan_flight.do(cache_key, lambda: generate_plan(preferences, cache_key))
+        if coalesced and not cache_keys.plan_fits(plan_data, preferences):
+            # The in-flight plan was made for a larger budget in the same band.
+            plan_data, is_llm_plan = await plan_flight.do(f"{cache_key}-{preferences.budget}", lambda: generate_plan(preferences, cache_key))
+
+    # Every caller, including coalesced ones, gets its own session.
+    final_plan = start_session(plan_data)
+    replacement_pool.schedule(final_plan.outing_id, final_plan.plan, preferences, use_llm=is_llm_plan)
+    logging.info("Returning plan for key %s. Outing ID: %s", cache_key, final_plan.outing_id)
     return final_plan
 
+def complete_partial_plan(events: List[Event], preferences: UserPreferences) -> List[Event]:
+    """
+    Local spots for the slots a failed LLM stream left empty, preferring the requested interests
+    and keeping the whole plan within the budget. May return fewer spots than slots.
+    """
+    # Imported here, like the planner itself, so NumPy stays out of the cold-start path.
+    from backend.utils.local_planner import EVENTS_PER_PLAN
+
+    categories = list(dict.fromkeys(category for interest in preferences.interests for category in interest_categories(interest)))
+    categories += [category for category in spot_catalog.categories() if category not in categories]
+    taken = [event.name for event in events]
+    remaining_budget = preferences.budget - sum(event.cost for event in events)
+    fill: List[Event] = []
+    for slots_left in range(EVENTS_PER_PLAN - len(events), 0, -1):
+        # Leave an equal share of the budget for every slot still to fill.
+        max_cost = remaining_budget // slots_left
+        local_choice = None
+        for category in categories:
+            local_choice = spot_catalog.random_choice(category, exclude=taken, max_cost=max_cost)
+            if local_choice:
+                # Rotate so the next slot tries a different category first.
+                categories.append(categories.pop(categories.index(category)))
+                break
+        if not local_choice:
+            break
+        fill.append(Event(**local_choice))
+        taken.append(local_choice["name"])
+        remaining_budget -= local_choice["cost"]
+    return fill
+
+async def stream_outing_plan(preferences: UserPreferences) -> AsyncIterator[dict]:
+    """
+    Yields NDJSON messages: one "event" per plan event as soon as it is parsed, an "image"
+    update per event whose image resolves later, then a final "plan" with totals and outing_id.
+    """
+    preferences = canonical_preferences(preferences)
+    preference_tracker.record(preferences)
+    cache_key = plan_cache_key(preferences)
+    plan_data = lookup_cached_plan(cache_key, preferences)
+    if plan_data is not None:
+        logging.info("CACHE HIT for streamed key: %s", cache_key)
+        final_plan = start_session(plan_data)
+        replacement_pool.schedule(final_plan.outing_id, final_plan.plan, preferences)
+        for index, event in enumerate(final_plan.plan):
+            yield {"type": "event", "index": index, "event": event.model_dump(mode="json")}
+        yield {"type": "plan", **final_plan.model_dump(mode="json")}
+        return
+
+    messages: asyncio.Queue = asyncio.Queue()
+    events: List[Event] = []
+    image_tasks: List[asyncio.Task] = []
+
+    async def resolve_image(index: int, event: Event):
+        event.image_url = await image_resolver.resolve(event.name)
+        await messages.put({"type": "image", "index": index, "image_url": event.image_url})
+
+    def emit_event(event: Event):
+        index = len(events)
+        events.append(event)
+        messages.put_nowait({"type": "event", "index": index, "event": event.model_dump(mode="json")})
+        if not event.image_url:
+            image_tasks.append(asyncio.create_task(resolve_image(index, event)))
+
+    async def produce():
+        is_llm_plan = False
+        try:
+            try:
+                parser = JsonArrayStreamParser()
+                # Closed here, not by the garbage collector, so llm_guard always sees how the stream ended.
+                async with aclosing(stream_plan_with_llm(preferences)) as chunks:
+                    async for chunk in chunks:
+                        for event_data in parser.feed(chunk):
+                            max_cost = preferences.budget - sum(event.cost for event in events)
+                            emit_event(replace_excluded_event(Event(**event_data), events, "plan_stream", max_cost))
+                if not events:
+                    raise ValueError("Streamed LLM response contained no events.")
+                is_llm_plan = True
+            except Exception as e:
+                llm_fallbacks.inc(route="plan_stream")
+                if events:
+                    # Events already sent cannot be taken back, so finish the plan around them.
+                    logging.error("Streaming LLM call failed after %d events, completing the plan from local data. Error: %s", len(events), e)
+                    for event in complete_partial_plan(events, preferences):
+                        emit_event(event)
+                else:
+                    logging.error("Streaming LLM call failed, attempting local fallback. Error: %s", e)
+                    local_plan = local_planner.plan(preferences)
+                    if not local_plan:
+                        raise HTTPException(status_code=500, detail="Failed to generate plan from any source.")
+                    for spot in local_plan.spots:
+                        emit_event(Event(**spot))
+
+            await asyncio.gather(*image_tasks)
+            if is_llm_plan:
+                for event in events:
+                    add_event_to_local_dictionary(event)
+            total_cost = sum(event.cost for event in events)
+            total_duration = sum(event.duration for event in events)
+            plan_data = OutingPlan(plan=events, total_cost=total_cost, total_duration=total_duration, outing_id="").model_dump(mode="json")
+            if is_llm_plan:
+                await api_cache.aset(cache_key, plan_data)
+            final_plan = start_session(plan_data)
+            replacement_pool.schedule(final_plan.outing_id, final_plan.plan, preferences, use_llm=is_llm_plan)
+            logging.info("Successfully streamed plan with %d events. Outing ID: %s", len(events), final_plan.outing_id)
+            await messages.put({"type": "plan", **final_plan.model_dump(mode="json")})
+        except Exception as e:
+            logging.error("Streaming plan failed. Error: %s", e)
+            detail = e.detail if isinstance(e, HTTPException) else "Failed to generate a valid plan."
+            await messages.put({"type": "error", "detail": detail})
+        finally:
+            await messages.put(None)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while (message := await messages.get()) is not None:
+            yield message
+    finally:
+        # Client went away: stop talking to Gemini/Pexels on its behalf.
+        if not producer.done():
+            producer.cancel()
+            for task in image_tasks:
+                task.cancel()
+
+@app.post("/api/plan/stream")
+async def create_outing_plan_stream(preferences: UserPreferences):
+    logging.info("Creating streamed outing plan with preferences: %s", preferences)
+
+    async def body():
+        async for message in stream_outing_plan(preferences):
+            yield json.dumps(message) + "\n"
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
 @app.post("/api/regenerate-event", response_model=OutingPlan)
 async def regenerate_event(request: RegenerateRequest):
-    current_regen_count = regeneration_counts.get(request.outing_id, 0)
+    with metrics.request("regenerate"), outing_scope(request.outing_id):
+        return await _regenerate_event(request)
+
+async def _regenerate_event(request: RegenerateRequest) -> OutingPlan:
+    current_regen_count = regeneration_counts.get(request.outing_id) or 0
     if current_regen_count >= MAX_REGENERATIONS:
-        logging.warning(f"Regeneration limit reached for outing_id: {request.outing_id}")
+        logging.warning("Regeneration limit reached for outing_id: %s", request.outing_id)
         raise HTTPException(status_code=403, detail=f"Regeneration limit of {MAX_REGENERATIONS} reached for this outing.")
 
-    event_to_replace_name = request.current_plan[request.event_index_to_replace].name
-    cache_key = f"regen-{request.outing_id}-{request.event_index_to_replace}-{event_to_replace_name}"
-    
-    if cache_key in api_cache:
-        cached_plan, timestamp = api_cache[cache_key]
-        if time.time() - timestamp < CACHE_TTL_SECONDS:
-            logging.info(f"CACHE HIT for regeneration key: {cache_key}")
-            regeneration_counts[request.outing_id] = current_regen_count + 1
-            return cached_plan
-        else:
-            logging.info(f"CACHE EXPIRED for regeneration key: {cache_key}")
-            del api_cache[cache_key]
+    event_to_replace = request.current_plan[request.event_index_to_replace]
+    cache_key = cache_keys.regeneration_key(event_to_replace, canonical_preferences(request.user_preferences))
+    logging.info("Received /regenerate-event request for outing_id %s, index: %d. Count: %d", request.outing_id, request.event_index_to_replace, current_regen_count)
 
-    logging.info(f"Received /regenerate-event request for outing_id {request.outing_id}, index: {request.event_index_to_replace}. Count: {current_regen_count}")
-    
+    with metrics.stage("regenerate", "cache_lookup"):
+        cached_event = api_cache.get(cache_key)
     new_event = None
-    if current_regen_count < LOCAL_REGEN_LIMIT:
-        logging.info("Attempting local-first regeneration.")
-        new_event = get_local_replacement_event(request)
-        if not new_event:
-            logging.warning("Local-first failed, escalating to LLM.")
-            new_event = await get_llm_replacement_event(request)
+    regeneration_source = "cache"
+    if cached_event is None:
+        cache_lookups.record("regeneration", "miss")
+    elif not cache_keys.replacement_fits(cached_event, request.current_plan, request.event_index_to_replace):
+        cache_lookups.record("regeneration", "stale")
     else:
-        logging.info("Local limit reached, using LLM-first regeneration.")
-        new_event = await get_llm_replacement_event(request)
+        cache_lookups.record("regeneration", "hit")
+        logging.info("CACHE HIT for regeneration key: %s", cache_key)
+        new_event = Event(**cached_event)
+
+    if new_event is None:
+        existing_names = {event.name for event in request.current_plan}
+        regeneration_source = "pool"
+        with metrics.stage("regenerate", "pool_lookup"):
+            new_event = replacement_pool.pop(request.outing_id, request.event_index_to_replace, exclude=existing_names)
+        if new_event:
+            logging.info("Serving replacement from the prefetched pool.")
+        elif current_regen_count < LOCAL_REGEN_LIMIT:
+            logging.info("Attempting local-first regeneration.")
+            regeneration_source = "local"
+            with metrics.stage("regenerate", "local_lookup"):
+                new_event = get_local_replacement_event(request)
+            if not new_event:
+                logging.warning("Local-first failed, escalating to LLM.")
+                regeneration_source = "llm"
+                new_event = await get_llm_replacement_event(request)
+        else:
+            logging.info("Local limit reached, using LLM-first regeneration.")
+            regeneration_source = "llm"
+            new_event = await get_llm_replacement_event(request)
 
     if not new_event:
         raise HTTPException(status_code=500, detail="Could not find a suitable replacement from any source.")
 
     if not new_event.image_url:
-        new_event.image_url = await get_image_for_event(new_event.name)
+        with metrics.stage("regenerate", "image_resolution"):
+            new_event.image_url = await get_image_for_event(new_event.name)
     
-    add_event_to_local_dictionary(new_event)
+    with metrics.stage("regenerate", "catalog_update"):
+        add_event_to_local_dictionary(new_event)
+        record_spot_usage([new_event])
+    regeneration_sources.inc(source=regeneration_source)
 
     updated_plan_events = request.current_plan
     updated_plan_events[request.event_index_to_replace] = new_event
@@ -373,13 +860,154 @@ async def regenerate_event(request: RegenerateRequest):
     
     final_plan = OutingPlan(plan=updated_plan_events, total_cost=total_cost, total_duration=total_duration, outing_id=request.outing_id)
     
-    api_cache[cache_key] = (final_plan, time.time())
+    if regeneration_source != "cache":
+        await api_cache.aset(cache_key, new_event.model_dump(mode="json"))
     
-    regeneration_counts[request.outing_id] = current_regen_count + 1
-    logging.info(f"Successfully regenerated event at index {request.event_index_to_replace}. New count: {regeneration_counts[request.outing_id]}")
+    new_regen_count = await regeneration_counts.aincr(request.outing_id)
+    if new_regen_count >= MAX_REGENERATIONS:
+        replacement_pool.discard(request.outing_id)
+    logging.info("Successfully regenerated event at index %d. New count: %d", request.event_index_to_replace, new_regen_count)
     
     return final_plan
 
+@app.post("/api/regenerate-events", response_model=OutingPlan)
+async def regenerate_events(request: BatchRegenerateRequest):
+    with metrics.request("regenerate_batch"), outing_scope(request.outing_id):
+        return await _regenerate_events(request)
+
+async def _regenerate_events(request: BatchRegenerateRequest) -> OutingPlan:
+    """
+    Replaces several events at once: cached and pooled replacements first, then one pass over
+    the local catalog (while under LOCAL_REGEN_LIMIT) or one LLM call for everything left.
+    No replacement repeats another event of the plan or of the batch.
+    """
+    plan = request.current_plan
+    indices = list(dict.fromkeys(request.event_indices_to_replace))
+    if not indices or any(not 0 <= index < len(plan) for index in indices):
+        raise HTTPException(status_code=400, detail="event_indices_to_replace must list valid positions in current_plan.")
+    current_regen_count = regeneration_counts.get(request.outing_id) or 0
+    if current_regen_count + len(indices) > MAX_REGENERATIONS:
+        logging.warning("Regeneration limit reached for outing_id: %s", request.outing_id)
+        raise HTTPException(status_code=403, detail=f"Replacing {len(indices)} events would exceed the regeneration limit of {MAX_REGENERATIONS} for this outing.")
+    logging.info("Received /regenerate-events request for outing_id %s, indices: %s. Count: %d", request.outing_id, indices, current_regen_count)
+
+    preferences = canonical_preferences(request.user_preferences)
+    cache_keys_by_index = {index: cache_keys.regeneration_key(plan[index], preferences) for index in indices}
+    replacements: Dict[int, Event] = {}
+    sources: Dict[int, str] = {}
+    taken_names = [event.name for event in plan]
+    taken = {normalize_name(name) for name in taken_names}
+
+    def accept(index: int, event: Event, source: str) -> bool:
+        if normalize_name(event.name) in taken:
+            return False
+        replacements[index] = event
+        sources[index] = source
+        taken.add(normalize_name(event.name))
+        taken_names.append(event.name)
+        return True
+
+    def remaining() -> List[int]:
+        return [index for index in indices if index not in replacements]
+
+    def fill_from_local_catalog():
+        for index in remaining():
+            local_choice = spot_catalog.random_choice(classify_category(plan[index].type), exclude=taken_names)
+            if local_choice:
+                accept(index, Event(**local_choice), "local")
+
+    with metrics.stage("regenerate_batch", "cache_lookup"):
+        for index in indices:
+            cached_event = api_cache.get(cache_keys_by_index[index])
+            if cached_event is None:
+                cache_lookups.record("regeneration", "miss")
+            elif accept(index, Event(**cached_event), "cache"):
+                cache_lookups.record("regeneration", "hit")
+            else:
+                cache_lookups.record("regeneration", "stale")
+
+    with metrics.stage("regenerate_batch", "pool_lookup"):
+        for index in remaining():
+            pooled = replacement_pool.pop(request.outing_id, index, exclude=taken_names)
+            if pooled:
+                accept(index, pooled, "pool")
+
+    if remaining() and current_regen_count < LOCAL_REGEN_LIMIT:
+        with metrics.stage("regenerate_batch", "local_lookup"):
+            fill_from_local_catalog()
+
+    if remaining():
+        try:
+            llm_events = await get_llm_batch_replacements(plan, remaining(), request.user_preferences)
+            for index, event in llm_events.items():
+                if prompt_builder.is_excluded(event.name):
+                    excluded_venues.inc(route="regenerate_batch")
+                    continue
+                accept(index, event, "llm")
+        except Exception as e:
+            logging.warning("LLM call failed for batch regeneration, attempting local fallback. Error: %s", e)
+            llm_fallbacks.inc(route="regenerate_batch")
+        fill_from_local_catalog()
+
+    if remaining():
+        raise HTTPException(status_code=500, detail=f"Could not find suitable replacements for events {remaining()}.")
+
+    new_events = [replacements[index] for index in indices]
+    with metrics.stage("regenerate_batch", "image_resolution"):
+        await image_resolver.fill_event_images(new_events)
+    with metrics.stage("regenerate_batch", "catalog_update"):
+        for event in new_events:
+            add_event_to_local_dictionary(event)
+        record_spot_usage(new_events)
+
+    for index in indices:
+        regeneration_sources.inc(source=sources[index])
+        if sources[index] != "cache":
+            await api_cache.aset(cache_keys_by_index[index], replacements[index].model_dump(mode="json"))
+
+    updated_plan_events = [replacements.get(index, event) for index, event in enumerate(plan)]
+    total_cost = sum(event.cost for event in updated_plan_events)
+    total_duration = sum(event.duration for event in updated_plan_events)
+    final_plan = OutingPlan(plan=updated_plan_events, total_cost=total_cost, total_duration=total_duration, outing_id=request.outing_id)
+
+    new_regen_count = await regeneration_counts.aincr(request.outing_id, amount=len(indices))
+    if new_regen_count >= MAX_REGENERATIONS:
+        replacement_pool.discard(request.outing_id)
+    logging.info("Successfully regenerated events at indices %s. New count: %d", indices, new_regen_count)
+    return final_plan
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+def read_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/upstream-stats")
+def read_upstream_stats():
+    return {**upstream_clients.stats(), "images": image_resolver.stats(), "llm_guard": llm_guard.stats()}
+
+@app.get("/api/cache-stats")
+def read_cache_stats():
+    return {
+        "plans": api_cache.stats(),
+        "candidates": candidate_cache.stats(),
+        "regenerations": regeneration_counts.stats(),
+        "key_lookups": cache_lookups.stats(),
+        "plan_coalescing": plan_flight.stats(),
+        "replacement_pool": replacement_pool.stats(),
+        "learned_spots": learned_spots.stats(),
+        "cache_warming": {**cache_warmer.stats(), "tracked_combinations": len(preference_tracker)},
+    }
+
+@app.get("/api/startup-stats")
+def read_startup_stats():
+    return {
+        "mode": STARTUP_MODE,
+        **startup_timer.report(),
+        "catalog_loaded": spot_catalog.loaded,
+        "planner_loaded": local_planner.loaded,
+    }
+
 @app.get("/api")
 def read_root():
     return {"message": "Welcome to the OneStopOutings API"}
+
+startup_timer.mark("routes")
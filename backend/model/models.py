@@ -34,3 +34,13 @@ class RegenerateRequest(BaseModel):
     event_index_to_replace: int
     user_preferences: UserPreferences
     outing_id: str
+
+class BatchRegenerateRequest(BaseModel):
+    """
+    Defines the data needed to replace several events of a plan in one call.
+    Every replaced event counts towards the outing's regeneration limit.
+    """
+    current_plan: List[Event]
+    event_indices_to_replace: List[int]
+    user_preferences: UserPreferences
+    outing_id: str
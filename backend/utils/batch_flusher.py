@@ -0,0 +1,60 @@
+import asyncio
+from typing import Callable, Optional, Set
+
+
+class BatchFlusher:
+    """
+    Schedules a store's blocking `flush` on a worker thread so buffered writes reach disk in
+    batches: the first write after a flush waits `flush_interval_seconds` for more to join it,
+    and reaching `max_pending` pending writes flushes straight away.
+
+    Every task it starts is tracked. `aclose()` cancels the ones still waiting, lets the ones
+    already flushing finish, then flushes what is left, so nothing writes after the store closes.
+    """
+
+    def __init__(self, flush: Callable[[], int], pending_count: Callable[[], int], flush_interval_seconds: float = 2.0, max_pending: int = 100):
+        self.flush = flush
+        self.pending_count = pending_count
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_pending = max_pending
+        self._tasks: Set[asyncio.Task] = set()
+        self._waiting: Optional[asyncio.Task] = None
+        self._closed = False
+
+    async def _flush_later(self, wait: bool):
+        if wait:
+            await asyncio.sleep(self.flush_interval_seconds)
+        if self._waiting is asyncio.current_task():
+            # Writes made from here on need a new flush.
+            self._waiting = None
+        await asyncio.to_thread(self.flush)
+
+    def _forget(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if self._waiting is task:
+            self._waiting = None
+
+    def schedule(self):
+        """Schedules a background flush; batches all writes made before it runs."""
+        if self._closed or not self.pending_count():
+            return
+        full = self.pending_count() >= self.max_pending
+        if self._waiting is not None and not full:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        task = loop.create_task(self._flush_later(wait=not full))
+        self._tasks.add(task)
+        task.add_done_callback(self._forget)
+        if not full:
+            self._waiting = task
+
+    async def aclose(self):
+        self._closed = True
+        if self._waiting is not None:
+            self._waiting.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await asyncio.to_thread(self.flush)
@@ -0,0 +1,312 @@
+import abc
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class CacheBackend(abc.ABC):
+    """
+    Interface for a bounded key/value cache with per-entry TTL and LRU eviction.
+    Values must be JSON-serializable so every backend can store them.
+    """
+
+    def __init__(self, name: str, max_entries: int, default_ttl_seconds: float):
+        self.name = name
+        self.max_entries = max_entries
+        self.default_ttl_seconds = default_ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @abc.abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        ...
+
+    @abc.abstractmethod
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None):
+        ...
+
+    @abc.abstractmethod
+    def delete(self, key: str):
+        ...
+
+    @abc.abstractmethod
+    def incr(self, key: str, ttl_seconds: Optional[float] = None, amount: int = 1) -> int:
+        """Atomically adds `amount` to an integer entry (missing or expired counts as 0) and returns the new value."""
+
+    async def aset(self, key: str, value: Any, ttl_seconds: Optional[float] = None):
+        """`set` for async callers; backends whose writes can block run it off the event loop."""
+        self.set(key, value, ttl_seconds)
+
+    async def aincr(self, key: str, ttl_seconds: Optional[float] = None, amount: int = 1) -> int:
+        """`incr` for async callers; backends whose writes can block run it off the event loop."""
+        return self.incr(key, ttl_seconds, amount)
+
+    @abc.abstractmethod
+    def expires_in(self, key: str) -> Optional[float]:
+        """Seconds until `key` expires, or None if it is missing or expired. Not counted as a lookup."""
+
+    @abc.abstractmethod
+    def sweep(self) -> int:
+        """Removes expired entries and enforces the size bound; returns the number removed."""
+
+    @abc.abstractmethod
+    def size(self) -> int:
+        ...
+
+    def close(self):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self).__name__,
+            "size": self.size(),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class MemoryCacheBackend(CacheBackend):
+    """In-process LRU cache. Entries are (value, expires_at) kept in access order."""
+
+    def __init__(self, name: str, max_entries: int, default_ttl_seconds: float):
+        super().__init__(name, max_entries, default_ttl_seconds)
+        self._entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_entry(self, key: str, now: float) -> Optional[Tuple[Any, float]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= now:
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._get_entry(key, time.time())
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[0]
+
+    def _store(self, key: str, value: Any, ttl_seconds: Optional[float]):
+        ttl = self.default_ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._entries[key] = (value, time.time() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None):
+        with self._lock:
+            self._store(key, value, ttl_seconds)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def incr(self, key: str, ttl_seconds: Optional[float] = None, amount: int = 1) -> int:
+        with self._lock:
+            entry = self._get_entry(key, time.time())
+            value = (entry[0] if entry else 0) + amount
+            self._store(key, value, ttl_seconds)
+            return value
+
+    def expires_in(self, key: str) -> Optional[float]:
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        remaining = entry[1] - time.time()
+        return remaining if remaining > 0 else None
+
+    def sweep(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [key for key, (_, expires_at) in self._entries.items() if expires_at <= now]
+            for key in expired:
+                del self._entries[key]
+            self.expirations += len(expired)
+        return len(expired)
+
+    def size(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """
+    On-disk cache shared by every worker/process that opens the same file.
+    Each cache gets its own table; values are stored as JSON text.
+
+    Lookups are read-only and use their own connection, so under WAL they never wait for
+    another process's write lock. Hits only note the access time in memory; those times are
+    written in one batch before the size bound is enforced. Writes can wait on the lock, so
+    async callers use `aset`/`aincr`, which run them in a worker thread.
+    """
+
+    def __init__(self, name: str, max_entries: int, default_ttl_seconds: float, path: str):
+        super().__init__(name, max_entries, default_ttl_seconds)
+        if not name.isidentifier():
+            raise ValueError(f"Invalid cache name '{name}'.")
+        self.path = path
+        self.table = f"cache_{name}"
+        self._lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self._access_lock = threading.Lock()
+        self._accessed: Dict[str, float] = {}
+        self._writes_since_trim = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=10.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_expires ON {self.table} (expires_at)")
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_access ON {self.table} (last_access)")
+        self._read_conn = sqlite3.connect(path, timeout=10.0, check_same_thread=False, isolation_level=None)
+        self._read_conn.execute("PRAGMA query_only=ON")
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._read_lock:
+            row = self._read_conn.execute(f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)).fetchone()
+        # Expired rows are left for sweep() to delete.
+        if row is None or row[1] <= now:
+            self.misses += 1
+            return None
+        with self._access_lock:
+            self._accessed[key] = now
+        self.hits += 1
+        return json.loads(row[0])
+
+    def _flush_accesses(self):
+        with self._access_lock:
+            accessed, self._accessed = self._accessed, {}
+        if accessed:
+            self._conn.executemany(f"UPDATE {self.table} SET last_access = ? WHERE key = ?", [(accessed_at, key) for key, accessed_at in accessed.items()])
+
+    def _upsert(self, key: str, value: Any, ttl_seconds: Optional[float], now: float):
+        ttl = self.default_ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._conn.execute(
+            f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(value), now + ttl, now),
+        )
+        self._writes_since_trim += 1
+
+    def _maybe_trim(self):
+        # COUNT(*) is a full scan in SQLite, so only enforce the bound every few writes.
+        if self._writes_since_trim >= 64:
+            self._writes_since_trim = 0
+            self._trim()
+
+    def _trim(self) -> int:
+        self._flush_accesses()
+        overflow = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0] - self.max_entries
+        if overflow <= 0:
+            return 0
+        self._conn.execute(
+            f"DELETE FROM {self.table} WHERE key IN (SELECT key FROM {self.table} ORDER BY last_access LIMIT ?)",
+            (overflow,),
+        )
+        self.evictions += overflow
+        return overflow
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None):
+        with self._lock:
+            self._upsert(key, value, ttl_seconds, time.time())
+            self._maybe_trim()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def incr(self, key: str, ttl_seconds: Optional[float] = None, amount: int = 1) -> int:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)).fetchone()
+                value = (json.loads(row[0]) if row and row[1] > now else 0) + amount
+                self._upsert(key, value, ttl_seconds, now)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._maybe_trim()
+        return value
+
+    async def aset(self, key: str, value: Any, ttl_seconds: Optional[float] = None):
+        await asyncio.to_thread(self.set, key, value, ttl_seconds)
+
+    async def aincr(self, key: str, ttl_seconds: Optional[float] = None, amount: int = 1) -> int:
+        return await asyncio.to_thread(self.incr, key, ttl_seconds, amount)
+
+    def expires_in(self, key: str) -> Optional[float]:
+        with self._read_lock:
+            row = self._read_conn.execute(f"SELECT expires_at FROM {self.table} WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        remaining = row[0] - time.time()
+        return remaining if remaining > 0 else None
+
+    def sweep(self) -> int:
+        with self._lock:
+            expired = self._conn.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (time.time(),)).rowcount
+            self.expirations += expired
+            return expired + self._trim()
+
+    def size(self) -> int:
+        with self._read_lock:
+            return self._read_conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def close(self):
+        with self._read_lock:
+            self._read_conn.close()
+        with self._lock:
+            self._flush_accesses()
+            self._conn.close()
+
+
+def create_cache_backend(name: str, max_entries: int, default_ttl_seconds: float) -> CacheBackend:
+    """Builds the backend selected by CACHE_BACKEND ('memory' or 'sqlite')."""
+    backend = os.getenv("CACHE_BACKEND", "memory").lower()
+    if backend == "sqlite":
+        path = os.getenv("CACHE_SQLITE_PATH", "/tmp/onestopoutings_cache.db")
+        return SQLiteCacheBackend(name, max_entries, default_ttl_seconds, path)
+    if backend != "memory":
+        logging.warning("Unknown CACHE_BACKEND '%s', using in-process memory cache.", backend)
+    return MemoryCacheBackend(name, max_entries, default_ttl_seconds)
+
+
+async def sweep_periodically(backends: List[CacheBackend], interval_seconds: float):
+    """Background task that expires and trims every backend until cancelled."""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        for backend in backends:
+            try:
+                removed = await asyncio.to_thread(backend.sweep)
+                if removed:
+                    logging.info("Cache sweep removed %d entries from '%s'.", removed, backend.name)
+            except Exception as e:
+                logging.error("Cache sweep failed for '%s'. Error: %s", backend.name, e)
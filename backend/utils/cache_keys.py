@@ -0,0 +1,92 @@
+import bisect
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from backend.model.models import Event, UserPreferences
+from backend.utils.spot_catalog import normalize_name
+
+# Free-text spellings of the frontend interests; anything else is title-cased as is.
+INTEREST_SYNONYMS: Dict[str, str] = {
+    "food": "Food", "foodie": "Food", "dining": "Food", "restaurants": "Food", "eating out": "Food",
+    "history": "History", "historical": "History", "heritage": "History",
+    "art": "Art", "arts": "Art", "gallery": "Art", "galleries": "Art",
+    "music": "Music", "live music": "Music", "gigs": "Music", "concerts": "Music",
+    "nightlife": "Nightlife", "night life": "Nightlife", "bars": "Nightlife", "pubs": "Nightlife",
+    "shopping": "Shopping", "shops": "Shopping", "markets": "Shopping",
+}
+
+# Upper edges of the budget bands; a band is (previous edge, edge].
+DEFAULT_BUDGET_BANDS = (25, 50, 75, 100, 150, 200, 300, 500)
+
+
+def normalize_interest(interest: str) -> str:
+    key = " ".join(interest.lower().split())
+    return INTEREST_SYNONYMS.get(key, key.title())
+
+
+def canonical_preferences(preferences: UserPreferences) -> UserPreferences:
+    """Same request with interests normalized, de-duplicated and sorted, and the mode lower-cased."""
+    interests = sorted({normalize_interest(interest) for interest in preferences.interests if interest.strip()})
+    return UserPreferences(budget=preferences.budget, interests=interests, mode=preferences.mode.strip().lower())
+
+
+def parse_budget_bands(spec: Optional[str]) -> Sequence[int]:
+    if not spec:
+        return DEFAULT_BUDGET_BANDS
+    return tuple(sorted({int(edge) for edge in spec.split(",") if edge.strip()}))
+
+
+class CacheKeyBuilder:
+    """
+    Canonical cache keys, so requests that only differ in spelling or by a few euros of
+    budget share an entry. Budgets are bucketed into bands; a plan cached for a band must
+    still pass `plan_fits` for the caller's exact budget before it is served.
+    """
+
+    def __init__(self, budget_bands: Sequence[int] = DEFAULT_BUDGET_BANDS):
+        self.budget_bands = list(budget_bands)
+
+    def budget_band(self, budget: int) -> str:
+        index = bisect.bisect_left(self.budget_bands, budget)
+        low = self.budget_bands[index - 1] if index > 0 else 0
+        high = self.budget_bands[index] if index < len(self.budget_bands) else "max"
+        return f"{low}-{high}"
+
+    def _preferences_part(self, preferences: UserPreferences) -> str:
+        """Expects canonical preferences."""
+        return f"{preferences.mode}-{self.budget_band(preferences.budget)}-{'-'.join(preferences.interests)}"
+
+    def plan_key(self, preferences: UserPreferences) -> str:
+        return f"plan-{self._preferences_part(preferences)}"
+
+    def regeneration_key(self, event_to_replace: Event, preferences: UserPreferences) -> str:
+        """Keyed on content (the replaced event and preferences), not the session, so it is shared across outings."""
+        return f"regen-{self._preferences_part(preferences)}-{normalize_name(event_to_replace.type)}-{normalize_name(event_to_replace.name)}"
+
+    @staticmethod
+    def plan_fits(plan_data: dict, preferences: UserPreferences) -> bool:
+        return plan_data["total_cost"] <= preferences.budget
+
+    @staticmethod
+    def replacement_fits(event_data: dict, plan: List[Event], index: int) -> bool:
+        """A shared replacement must not already be in this outing's plan."""
+        name = normalize_name(event_data["name"])
+        return all(normalize_name(event.name) != name for position, event in enumerate(plan) if position != index) and name != normalize_name(plan[index].name)
+
+
+class LookupStats:
+    """Hit/miss/stale counts per logical cache (several share one backend), to show key canonicalization gains."""
+
+    RESULTS = ("hit", "miss", "stale")
+
+    def __init__(self, caches: Iterable[str]):
+        self._counts: Dict[str, Dict[str, int]] = {cache: {result: 0 for result in self.RESULTS} for cache in caches}
+
+    def record(self, cache: str, result: str):
+        self._counts[cache][result] += 1
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        report = {}
+        for cache, counts in self._counts.items():
+            lookups = sum(counts.values())
+            report[cache] = {**counts, "hit_ratio": round(counts["hit"] / lookups, 4) if lookups else 0.0}
+        return report
@@ -0,0 +1,219 @@
+"""
+Cache warming: pre-generates plans for the most requested preference combinations so they
+are cache hits from the first request after a cold start, and refreshes them before they
+reach the cache TTL.
+
+Combinations come from the plan requests a process has served (PreferenceTracker), from
+app logs, or from an enumeration of the frontend's interests, modes and budget bands.
+Run it offline against the shared SQLite caches, e.g. before deploying:
+
+    CACHE_BACKEND=sqlite python -m backend.utils.cache_warmer --log-file /tmp/logs/app.log --top 50
+"""
+import argparse
+import ast
+import asyncio
+import itertools
+import logging
+import os
+import re
+import sys
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from backend.model.models import UserPreferences
+from backend.utils.cache import CacheBackend
+from backend.utils.cache_keys import DEFAULT_BUDGET_BANDS, CacheKeyBuilder, canonical_preferences, parse_budget_bands
+
+FRONTEND_INTERESTS = ("Food", "History", "Art", "Music", "Nightlife", "Shopping")
+MODES = ("surprise", "must-see")
+
+# Matches the str() of UserPreferences in the "Creating outing plan with preferences" log lines.
+PREFERENCES_LOG_PATTERN = re.compile(r"outing plan with preferences: budget=(\d+) interests=(\[.*?\]) mode='([^']*)'")
+
+PlanGenerator = Callable[[UserPreferences], Awaitable[bool]]
+
+
+class PreferenceTracker:
+    """
+    Counts plan requests per plan cache key. Each key keeps the lowest budget requested in
+    its band, so a plan warmed for it fits every caller seen so far.
+    """
+
+    def __init__(self, key_builder: CacheKeyBuilder, max_keys: int = 1000):
+        self.key_builder = key_builder
+        self.max_keys = max_keys
+        self._counts: Dict[str, Tuple[int, UserPreferences]] = {}
+
+    def record(self, preferences: UserPreferences):
+        """Expects canonical preferences."""
+        key = self.key_builder.plan_key(preferences)
+        count, kept = self._counts.get(key, (0, preferences))
+        if preferences.budget < kept.budget:
+            kept = preferences
+        self._counts[key] = (count + 1, kept)
+        if len(self._counts) > self.max_keys:
+            del self._counts[min(self._counts, key=lambda candidate: self._counts[candidate][0])]
+
+    def most_common(self, limit: int) -> List[UserPreferences]:
+        ranked = sorted(self._counts.values(), key=lambda entry: entry[0], reverse=True)
+        return [preferences for _, preferences in ranked[:limit]]
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+
+def preferences_from_log(lines: Iterable[str], tracker: PreferenceTracker) -> int:
+    """Feeds every plan request found in app log lines to `tracker`; returns how many were found."""
+    found = 0
+    for line in lines:
+        match = PREFERENCES_LOG_PATTERN.search(line)
+        if not match:
+            continue
+        try:
+            interests = ast.literal_eval(match.group(2))
+            preferences = UserPreferences(budget=int(match.group(1)), interests=interests, mode=match.group(3))
+        except (ValueError, SyntaxError):
+            continue
+        tracker.record(canonical_preferences(preferences))
+        found += 1
+    return found
+
+
+def preferences_from_log_file(path: str, tracker: PreferenceTracker) -> int:
+    with open(path, errors="replace") as f:
+        return preferences_from_log(f, tracker)
+
+
+def band_floor_budgets(budget_bands: Sequence[int] = DEFAULT_BUDGET_BANDS) -> List[int]:
+    """The lowest budget in each band (the first band uses its upper edge), so warmed plans fit the whole band."""
+    return [budget_bands[0]] + [edge + 1 for edge in budget_bands]
+
+
+def enumerate_preferences(budgets: Sequence[int], interests: Sequence[str] = FRONTEND_INTERESTS, modes: Sequence[str] = MODES, max_interests: int = 2) -> List[UserPreferences]:
+    """Every combination of up to `max_interests` interests, each mode and each budget, fewest interests first."""
+    combinations = []
+    for size in range(1, max_interests + 1):
+        for chosen in itertools.combinations(interests, size):
+            for mode in modes:
+                for budget in budgets:
+                    combinations.append(canonical_preferences(UserPreferences(budget=budget, interests=list(chosen), mode=mode)))
+    return combinations
+
+
+class CacheWarmer:
+    """
+    Generates plans for preference combinations with bounded concurrency and a minimum
+    spacing between generations, so warming never crowds live requests off the LLM.
+    Combinations whose cached plan has more than `refresh_margin_seconds` left to live are
+    skipped, so repeated runs only regenerate what is missing or about to expire.
+    """
+
+    def __init__(self, generate: PlanGenerator, cache: CacheBackend, key_builder: CacheKeyBuilder, refresh_margin_seconds: float = 3600.0, concurrency: int = 2, rate_per_second: float = 1.0):
+        self.generate = generate
+        self.cache = cache
+        self.key_builder = key_builder
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self.concurrency = concurrency
+        self.rate_per_second = rate_per_second
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._rate_lock = asyncio.Lock()
+        self._next_start = 0.0
+        self.runs = 0
+        self.warmed = 0
+        self.skipped = 0
+        self.failed = 0
+        self.last_run_at: Optional[float] = None
+
+    def needs_refresh(self, preferences: UserPreferences) -> bool:
+        remaining = self.cache.expires_in(self.key_builder.plan_key(preferences))
+        return remaining is None or remaining <= self.refresh_margin_seconds
+
+    async def _wait_for_rate(self):
+        if self.rate_per_second <= 0:
+            return
+        async with self._rate_lock:
+            now = time.monotonic()
+            delay = self._next_start - now
+            self._next_start = max(now, self._next_start) + 1 / self.rate_per_second
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _warm_one(self, preferences: UserPreferences) -> str:
+        async with self._semaphore:
+            # Checked once a slot is free: live traffic may have cached it in the meantime.
+            if not self.needs_refresh(preferences):
+                return "skipped"
+            await self._wait_for_rate()
+            try:
+                return "warmed" if await self.generate(preferences) else "failed"
+            except Exception as e:
+                logging.warning("Cache warming failed for %s. Error: %s", self.key_builder.plan_key(preferences), e)
+                return "failed"
+
+    async def warm(self, combinations: Iterable[UserPreferences]) -> Dict[str, int]:
+        """Warms each distinct plan key once; returns the warmed/skipped/failed counts of this run."""
+        unique: Dict[str, UserPreferences] = {}
+        for preferences in combinations:
+            preferences = canonical_preferences(preferences)
+            unique.setdefault(self.key_builder.plan_key(preferences), preferences)
+        results = await asyncio.gather(*(self._warm_one(preferences) for preferences in unique.values()))
+        counts = {result: results.count(result) for result in ("warmed", "skipped", "failed")}
+        self.runs += 1
+        self.warmed += counts["warmed"]
+        self.skipped += counts["skipped"]
+        self.failed += counts["failed"]
+        self.last_run_at = time.time()
+        if unique:
+            logging.info("Cache warming run over %d combinations: %s.", len(unique), counts)
+        return counts
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        return {
+            "runs": self.runs,
+            "warmed": self.warmed,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "last_run_at": self.last_run_at,
+        }
+
+
+async def run(args: argparse.Namespace) -> int:
+    # The app is imported only now, so its env (cache backend and paths) is the one this CLI runs with.
+    os.environ["CACHE_WARM_INTERVAL_SECONDS"] = "0"
+    from api.index import app, api_cache, cache_keys, warm_plan
+
+    tracker = PreferenceTracker(cache_keys)
+    for path in args.log_file:
+        print(f"Found {preferences_from_log_file(path, tracker)} plan requests in '{path}'.")
+    combinations = tracker.most_common(args.top)
+    if args.enumerate:
+        combinations += enumerate_preferences(band_floor_budgets(parse_budget_bands(os.getenv("BUDGET_BANDS"))), max_interests=args.max_interests)
+    if not combinations:
+        print("Nothing to warm: pass --log-file and/or --enumerate.", file=sys.stderr)
+        return 2
+
+    warmer = CacheWarmer(warm_plan, api_cache, cache_keys, refresh_margin_seconds=args.refresh_margin, concurrency=args.concurrency, rate_per_second=args.rate)
+    async with app.router.lifespan_context(app):
+        counts = await warmer.warm(combinations)
+    print(f"Warmed {counts['warmed']}, skipped {counts['skipped']} still fresh, {counts['failed']} failed.")
+    return 1 if counts["failed"] else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generate plans for popular preference combinations into the shared caches.")
+    parser.add_argument("--log-file", action="append", default=[], help="App log to learn request frequencies from (repeatable, e.g. rotated files).")
+    parser.add_argument("--top", type=int, default=50, help="Warm at most this many logged combinations, most frequent first.")
+    parser.add_argument("--enumerate", action="store_true", help="Also warm every combination of the frontend interests, modes and budget bands.")
+    parser.add_argument("--max-interests", type=int, default=2, help="Largest interest combination to enumerate.")
+    parser.add_argument("--concurrency", type=int, default=2)
+    parser.add_argument("--rate", type=float, default=1.0, help="Most plan generations started per second.")
+    parser.add_argument("--refresh-margin", type=float, default=3600.0, help="Regenerate cached plans expiring within this many seconds.")
+    args = parser.parse_args()
+    if os.getenv("CACHE_BACKEND", "memory").lower() != "sqlite":
+        print("CACHE_BACKEND is not 'sqlite', so warmed plans would only live in this process.", file=sys.stderr)
+        sys.exit(2)
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import os
+import logging
+from typing import TYPE_CHECKING, Dict, Optional
+
+if TYPE_CHECKING:
+    import httpx
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        logging.warning("Invalid value for %s, using default %s.", name, default)
+        return default
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        logging.warning("Invalid value for %s, using default %s.", name, default)
+        return default
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class UpstreamClient:
+    """
+    A long-lived, pooled httpx client for a single upstream API.
+    Counts requests and new TCP/TLS connections so connection reuse can be checked.
+    """
+
+    def __init__(self, name: str, base_url: str, timeout: float):
+        self.name = name
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_connections = _env_int("HTTP_MAX_CONNECTIONS", 20)
+        self.max_keepalive_connections = _env_int("HTTP_MAX_KEEPALIVE_CONNECTIONS", 10)
+        self.keepalive_expiry = _env_float("HTTP_KEEPALIVE_EXPIRY_SECONDS", 60.0)
+        self.http2 = os.getenv("HTTP2_ENABLED", "false").lower() == "true"
+        if self.http2 and not _http2_available():
+            logging.warning("HTTP/2 requested for %s but 'h2' is not installed. Falling back to HTTP/1.1.", name)
+            self.http2 = False
+        self._client: Optional["httpx.AsyncClient"] = None
+        self.requests_sent = 0
+        self.connections_opened = 0
+        self.tls_handshakes = 0
+
+    async def _trace(self, event_name: str, info: dict):
+        if event_name == "connection.connect_tcp.complete":
+            self.connections_opened += 1
+        elif event_name == "connection.start_tls.complete":
+            self.tls_handshakes += 1
+
+    async def _on_request(self, request: "httpx.Request"):
+        self.requests_sent += 1
+        request.extensions["trace"] = self._trace
+
+    @property
+    def client(self) -> "httpx.AsyncClient":
+        # Created lazily so callers outside the app lifespan (e.g. scripts) still work,
+        # and httpx is only imported once an upstream is actually called.
+        if self._client is None or self._client.is_closed:
+            import httpx
+
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=httpx.Timeout(self.timeout, connect=min(self.timeout, 5.0)),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                    keepalive_expiry=self.keepalive_expiry,
+                ),
+                http2=self.http2,
+                event_hooks={"request": [self._on_request]},
+            )
+            logging.info("Opened pooled HTTP client for %s (http2=%s, max_connections=%d).", self.name, self.http2, self.max_connections)
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+            logging.info("Closed pooled HTTP client for %s. Stats: %s", self.name, self.stats())
+        self._client = None
+
+    def stats(self) -> Dict[str, float]:
+        reused = max(self.requests_sent - self.connections_opened, 0)
+        reuse_ratio = reused / self.requests_sent if self.requests_sent else 0.0
+        return {
+            "requests_sent": self.requests_sent,
+            "connections_opened": self.connections_opened,
+            "tls_handshakes": self.tls_handshakes,
+            "connections_reused": reused,
+            "reuse_ratio": round(reuse_ratio, 4),
+            "http2": self.http2,
+        }
+
+
+class UpstreamClients:
+    """Holds one pooled client per upstream; owned by the FastAPI lifespan."""
+
+    def __init__(self):
+        self.gemini = UpstreamClient(
+            "gemini",
+            os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com"),
+            _env_float("GEMINI_TIMEOUT_SECONDS", 30.0),
+        )
+        self.pexels = UpstreamClient(
+            "pexels",
+            os.getenv("PEXELS_BASE_URL", "https://api.pexels.com"),
+            _env_float("PEXELS_TIMEOUT_SECONDS", 10.0),
+        )
+
+    def start(self):
+        # Touch both clients so the pools exist before the first request.
+        self.gemini.client
+        self.pexels.client
+
+    async def aclose(self):
+        await self.gemini.aclose()
+        await self.pexels.aclose()
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {"gemini": self.gemini.stats(), "pexels": self.pexels.stats()}
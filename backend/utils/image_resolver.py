@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, List, MutableMapping, Optional
+
+from backend.model.models import Event
+from backend.utils.single_flight import SingleFlight
+
+
+class ImageResolver:
+    """
+    Resolves event images with a positive cache, a short-lived negative cache,
+    a concurrency cap on upstream fetches and one shared in-flight fetch per event name.
+
+    `fetch` returns the image URL, or None when the upstream has no photo; it may raise on errors.
+    `persist` is called after a batch of new URLs has been written into `cache`.
+    Negative entries expire after `negative_ttl_seconds` and at most `max_negative_entries` are kept.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str], Awaitable[Optional[str]]],
+        cache: MutableMapping[str, str],
+        persist: Optional[Callable[[], None]] = None,
+        max_concurrency: int = 4,
+        negative_ttl_seconds: float = 600.0,
+        max_negative_entries: int = 10000,
+    ):
+        self.fetch = fetch
+        self.cache = cache
+        self.persist = persist
+        self.max_concurrency = max_concurrency
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.max_negative_entries = max_negative_entries
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._flight = SingleFlight()
+        self._negative: "OrderedDict[str, float]" = OrderedDict()
+        self.hits = 0
+        self.negative_hits = 0
+        self.fetches = 0
+
+    def _lookup(self, event_name: str) -> Optional[str]:
+        if event_name in self.cache:
+            self.hits += 1
+            return self.cache[event_name]
+        expires_at = self._negative.get(event_name)
+        if expires_at is not None:
+            if time.monotonic() < expires_at:
+                self.negative_hits += 1
+                return ""
+            del self._negative[event_name]
+        return None
+
+    def _remember_missing(self, event_name: str):
+        now = time.monotonic()
+        # Every entry has the same TTL, so insertion order is expiry order and expired entries sit at the front.
+        while self._negative and (next(iter(self._negative.values())) <= now or len(self._negative) >= self.max_negative_entries):
+            self._negative.popitem(last=False)
+        self._negative.pop(event_name, None)
+        self._negative[event_name] = now + self.negative_ttl_seconds
+
+    async def _fetch_and_store(self, event_name: str) -> str:
+        async with self._semaphore:
+            self.fetches += 1
+            try:
+                image_url = await self.fetch(event_name)
+            except Exception as e:
+                logging.error("Failed to fetch image for '%s'. Error: %s", event_name, e)
+                image_url = None
+        if image_url:
+            self.cache[event_name] = image_url
+            return image_url
+        self._remember_missing(event_name)
+        return ""
+
+    async def _resolve_uncached(self, event_name: str) -> str:
+        if self._flight.in_flight(event_name):
+            logging.info("IMAGE FETCH COALESCED for: %s", event_name)
+        else:
+            logging.info("IMAGE CACHE MISS for: %s. Fetching from Pexels.", event_name)
+        return await self._flight.do(event_name, lambda: self._fetch_and_store(event_name))
+
+    async def resolve(self, event_name: str) -> str:
+        cached = self._lookup(event_name)
+        if cached is not None:
+            logging.info("IMAGE CACHE HIT for: %s", event_name)
+            return cached
+        image_url = await self._resolve_uncached(event_name)
+        if image_url and self.persist:
+            self.persist()
+        return image_url
+
+    async def resolve_many(self, event_names: Iterable[str]) -> Dict[str, str]:
+        results: Dict[str, str] = {}
+        pending: List[str] = []
+        for name in dict.fromkeys(event_names):
+            cached = self._lookup(name)
+            if cached is not None:
+                results[name] = cached
+            else:
+                pending.append(name)
+        if pending:
+            fetched = await asyncio.gather(*(self._resolve_uncached(name) for name in pending))
+            results.update(zip(pending, fetched))
+            if any(fetched) and self.persist:
+                self.persist()
+        return results
+
+    async def fill_event_images(self, events: List[Event]):
+        """Sets `image_url` on every event that lacks one, fetching all misses concurrently."""
+        missing = [event for event in events if not event.image_url]
+        if not missing:
+            return
+        resolved = await self.resolve_many(event.name for event in missing)
+        for event in missing:
+            event.image_url = resolved.get(event.name, "")
+
+    async def aclose(self):
+        await self._flight.aclose()
+
+    def stats(self) -> Dict[str, int]:
+        flight = self._flight.stats()
+        return {
+            "hits": self.hits,
+            "misses": flight["leaders"],
+            "negative_hits": self.negative_hits,
+            "coalesced": flight["coalesced"],
+            "fetches": self.fetches,
+            "in_flight": flight["in_flight"],
+            "negative_entries": len(self._negative),
+        }
@@ -0,0 +1,148 @@
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+from typing import Dict, Optional
+
+from backend.utils.batch_flusher import BatchFlusher
+
+
+class ImageCacheStore:
+    """
+    Persistent event-name -> image URL cache backed by SQLite (WAL mode).
+
+    Reads go through an in-memory dict first and fall back to an indexed primary-key
+    lookup, so they stay O(1)/O(log n) regardless of the number of venues. Lookups use their
+    own read-only connection: WAL readers never wait for a writer, so a memory miss on the
+    event loop is not held up by a flush waiting on another process's write lock.
+    Writes land in memory immediately and are flushed to disk in batches from a
+    worker thread by a BatchFlusher, so the event loop never blocks on file I/O. SQLite's locking
+    keeps concurrent writers from several processes safe.
+
+    Nothing touches the disk until the first lookup. If the database does not exist yet,
+    it is seeded from `seed_path` (a precompiled snapshot) and read through mmap.
+    """
+
+    def __init__(self, path: str, flush_interval_seconds: float = 2.0, max_pending: int = 100, legacy_json_path: Optional[str] = None, seed_path: Optional[str] = None, mmap_bytes: int = 64 * 1024 * 1024):
+        self.path = path
+        self.seed_path = seed_path
+        self.mmap_bytes = mmap_bytes
+        self.legacy_json_path = legacy_json_path
+        self._memory: Dict[str, str] = {}
+        self._pending: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._read_conn: Optional[sqlite3.Connection] = None
+        self._flusher = BatchFlusher(self.flush, lambda: len(self._pending), flush_interval_seconds, max_pending)
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            if self.seed_path and os.path.exists(self.seed_path) and not os.path.exists(self.path):
+                shutil.copyfile(self.seed_path, self.path)
+                logging.info("Seeded image cache '%s' from snapshot '%s'.", self.path, self.seed_path)
+            conn = sqlite3.connect(self.path, timeout=10.0, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA mmap_size={int(self.mmap_bytes)}")
+            conn.execute("CREATE TABLE IF NOT EXISTS images (event_name TEXT PRIMARY KEY, image_url TEXT NOT NULL)")
+            self._conn = conn
+            self._migrate_legacy_json()
+        return self._conn
+
+    def _reader(self) -> sqlite3.Connection:
+        if self._read_conn is None:
+            if self._conn is None:
+                with self._lock:
+                    self._connection()
+            conn = sqlite3.connect(self.path, timeout=10.0, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA query_only=ON")
+            conn.execute(f"PRAGMA mmap_size={int(self.mmap_bytes)}")
+            self._read_conn = conn
+        return self._read_conn
+
+    def _migrate_legacy_json(self):
+        if not self.legacy_json_path or not os.path.exists(self.legacy_json_path):
+            return
+        try:
+            with open(self.legacy_json_path, 'r') as f:
+                legacy = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logging.warning("Could not read legacy image cache '%s'. Error: %s", self.legacy_json_path, e)
+            return
+        if isinstance(legacy, dict) and legacy:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO images (event_name, image_url) VALUES (?, ?)",
+                [(name, url) for name, url in legacy.items() if url],
+            )
+            logging.info("Migrated %d images from legacy cache '%s'.", len(legacy), self.legacy_json_path)
+        os.replace(self.legacy_json_path, self.legacy_json_path + ".migrated")
+
+    def get(self, event_name: str, default: Optional[str] = None) -> Optional[str]:
+        image_url = self._memory.get(event_name)
+        if image_url is not None:
+            return image_url
+        with self._read_lock:
+            row = self._reader().execute("SELECT image_url FROM images WHERE event_name = ?", (event_name,)).fetchone()
+        if row is None:
+            return default
+        self._memory[event_name] = row[0]
+        return row[0]
+
+    def __contains__(self, event_name: str) -> bool:
+        return self.get(event_name) is not None
+
+    def __getitem__(self, event_name: str) -> str:
+        image_url = self.get(event_name)
+        if image_url is None:
+            raise KeyError(event_name)
+        return image_url
+
+    def __setitem__(self, event_name: str, image_url: str):
+        self._memory[event_name] = image_url
+        with self._pending_lock:
+            self._pending[event_name] = image_url
+
+    def flush(self) -> int:
+        """Writes all pending entries in one transaction. Safe to call from any thread."""
+        with self._lock:
+            with self._pending_lock:
+                if not self._pending:
+                    return 0
+                batch, self._pending = self._pending, {}
+            conn = self._connection()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.executemany("INSERT OR REPLACE INTO images (event_name, image_url) VALUES (?, ?)", batch.items())
+                conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                logging.error("Failed to flush %d images to '%s'. Error: %s", len(batch), self.path, e)
+                with self._pending_lock:
+                    for name, url in batch.items():
+                        self._pending.setdefault(name, url)
+                return 0
+        logging.info("Flushed %d images to '%s'.", len(batch), self.path)
+        return len(batch)
+
+    def schedule_flush(self):
+        """Schedules a background flush; batches all writes made before it runs."""
+        self._flusher.schedule()
+
+    async def aclose(self):
+        await self._flusher.aclose()
+        with self._read_lock:
+            if self._read_conn is not None:
+                self._read_conn.close()
+                self._read_conn = None
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
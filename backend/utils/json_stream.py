@@ -0,0 +1,63 @@
+import json
+import logging
+from typing import List
+
+
+class JsonArrayStreamParser:
+    """
+    Incrementally parses a JSON array of objects arriving in arbitrary text chunks
+    (e.g. LLM output, possibly wrapped in markdown fences) and returns each top-level
+    object as soon as its closing brace has been seen.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._position = 0
+        self._in_array = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._object_start = -1
+
+    def feed(self, chunk: str) -> List[dict]:
+        self._buffer += chunk
+        completed: List[dict] = []
+        buffer = self._buffer
+        i = self._position
+        while i < len(buffer):
+            char = buffer[i]
+            if not self._in_array:
+                if char == "[":
+                    self._in_array = True
+            elif self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                if self._depth == 0:
+                    self._object_start = i
+                self._depth += 1
+            elif char == "}" and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    object_text = buffer[self._object_start:i + 1]
+                    try:
+                        completed.append(json.loads(object_text))
+                    except json.JSONDecodeError as e:
+                        logging.warning("Skipping malformed object in streamed array. Error: %s", e)
+                    self._object_start = -1
+            i += 1
+        # Drop text that can no longer be part of an object to keep the buffer small.
+        if self._depth == 0:
+            self._buffer = ""
+            self._position = 0
+        else:
+            self._buffer = buffer[self._object_start:]
+            self._position = i - self._object_start
+            self._object_start = 0
+        return completed
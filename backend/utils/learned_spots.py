@@ -0,0 +1,217 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from backend.utils.batch_flusher import BatchFlusher
+from backend.utils.spot_catalog import SpotCatalog, normalize_name
+
+LearnedRow = Tuple[int, str, dict]
+
+
+class LearnedSpotStore:
+    """
+    Durable catalog of venues learned from LLM plans, shared by every worker through one
+    SQLite file (WAL mode).
+
+    - (category, normalized name) is unique, so concurrent writers from several workers
+      cannot create duplicates; later inserts of the same venue are ignored
+    - rows are loaded into a SpotCatalog incrementally by rowid, so startup reads in pages
+      and later refreshes only read what other workers added since
+    - per-spot usage counts are indexed, so trimming the least used spots happens in SQL
+      without reading the whole catalog into memory; a trimmed spot that is served again
+      gets its row back with its next usage count
+
+    `max_spots` bounds the database, and so what a worker loads at startup. Trimming does not
+    reach catalogs that are already loaded: a running worker keeps every spot it has loaded
+    or learned until it restarts.
+
+    Writes are buffered and flushed in batches from a worker thread by a BatchFlusher, like ImageCacheStore.
+    """
+
+    def __init__(self, path: str, max_spots: int = 5000, flush_interval_seconds: float = 2.0, max_pending: int = 100, page_size: int = 500):
+        self.name = "learned_spots"
+        self.path = path
+        self.max_spots = max_spots
+        self.page_size = page_size
+        self._pending_spots: Dict[Tuple[str, str], dict] = {}
+        self._pending_uses: Dict[Tuple[str, str], Tuple[int, dict]] = {}
+        self._last_id = 0
+        self._lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._flusher = BatchFlusher(self.flush, self._pending_count, flush_interval_seconds, max_pending)
+        self.loaded = 0
+        self.written = 0
+        self.duplicates = 0
+        self.trimmed = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10.0, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS learned_spots ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, category TEXT NOT NULL, normalized_name TEXT NOT NULL, "
+                "name TEXT NOT NULL, type TEXT NOT NULL, cost INTEGER NOT NULL, duration INTEGER NOT NULL, "
+                "image_url TEXT, uses INTEGER NOT NULL DEFAULT 0, created_at REAL NOT NULL, last_used_at REAL NOT NULL, "
+                "UNIQUE (category, normalized_name))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_learned_spots_name ON learned_spots (normalized_name)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_learned_spots_usage ON learned_spots (uses, last_used_at)")
+            self._conn = conn
+        return self._conn
+
+    def record(self, category: str, spot: dict):
+        """Buffers a newly learned spot for the next flush."""
+        with self._pending_lock:
+            self._pending_spots.setdefault((category, normalize_name(spot["name"])), dict(spot))
+
+    def record_use(self, category: str, spot: dict):
+        """Counts one serving of a learned spot, restoring its row if a sweep trimmed it."""
+        with self._pending_lock:
+            key = (category, normalize_name(spot["name"]))
+            count, _ = self._pending_uses.get(key, (0, None))
+            self._pending_uses[key] = (count + 1, dict(spot))
+
+    def _pending_count(self) -> int:
+        return len(self._pending_spots) + len(self._pending_uses)
+
+    def flush(self) -> int:
+        """Writes pending spots and usage counts in one transaction. Safe to call from any thread."""
+        with self._lock:
+            with self._pending_lock:
+                if not self._pending_count():
+                    return 0
+                spots, self._pending_spots = self._pending_spots, {}
+                uses, self._pending_uses = self._pending_uses, {}
+            now = time.time()
+            conn = self._connection()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                before = conn.total_changes
+                conn.executemany(
+                    "INSERT OR IGNORE INTO learned_spots (category, normalized_name, name, type, cost, duration, image_url, created_at, last_used_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(category, key, spot["name"], spot["type"], spot["cost"], spot["duration"], spot.get("image_url"), now, now) for (category, key), spot in spots.items()],
+                )
+                inserted = conn.total_changes - before
+                conn.executemany(
+                    "INSERT INTO learned_spots (category, normalized_name, name, type, cost, duration, image_url, uses, created_at, last_used_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (category, normalized_name) DO UPDATE SET uses = uses + excluded.uses, last_used_at = excluded.last_used_at",
+                    [(category, key, spot["name"], spot["type"], spot["cost"], spot["duration"], spot.get("image_url"), count, now, now) for (category, key), (count, spot) in uses.items()],
+                )
+                conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                logging.error("Failed to flush %d learned spots to '%s'. Error: %s", len(spots), self.path, e)
+                with self._pending_lock:
+                    for key, spot in spots.items():
+                        self._pending_spots.setdefault(key, spot)
+                    for key, (count, spot) in uses.items():
+                        pending_count, _ = self._pending_uses.get(key, (0, None))
+                        self._pending_uses[key] = (pending_count + count, spot)
+                return 0
+        self.written += inserted
+        self.duplicates += len(spots) - inserted
+        if spots:
+            logging.info("Flushed %d new learned spots to '%s' (%d already known).", inserted, self.path, len(spots) - inserted)
+        return inserted
+
+    def schedule_flush(self):
+        """Schedules a background flush; batches all writes made before it runs."""
+        self._flusher.schedule()
+
+    def fetch_new(self) -> List[LearnedRow]:
+        """Reads the next page of rows added (by any worker) since the last fetch."""
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT id, category, name, type, cost, duration, image_url FROM learned_spots WHERE id > ? ORDER BY id LIMIT ?",
+                (self._last_id, self.page_size),
+            ).fetchall()
+        if rows:
+            self._last_id = rows[-1][0]
+        return [
+            (row_id, category, {"type": event_type, "name": name, "cost": cost, "duration": duration, "image_url": image_url})
+            for row_id, category, name, event_type, cost, duration, image_url in rows
+        ]
+
+    def _apply(self, catalog: SpotCatalog, rows: List[LearnedRow]) -> int:
+        added = 0
+        for _, category, spot in rows:
+            if not catalog.has_category(category):
+                catalog.add_category(category)
+            if catalog.add(category, spot, learned=True):
+                added += 1
+        self.loaded += added
+        return added
+
+    def load_into(self, catalog: SpotCatalog) -> int:
+        """Loads every stored spot into `catalog` page by page; used when the catalog is built."""
+        added = 0
+        try:
+            while True:
+                rows = self.fetch_new()
+                if not rows:
+                    break
+                added += self._apply(catalog, rows)
+        except sqlite3.Error as e:
+            logging.error("Failed to load learned spots from '%s'. Error: %s", self.path, e)
+        if added:
+            logging.info("Loaded %d learned spots from '%s'.", added, self.path)
+        return added
+
+    async def refresh(self, catalog: SpotCatalog) -> int:
+        """Adds spots other workers learned since the last load; reads run in a worker thread."""
+        added = 0
+        while True:
+            rows = await asyncio.to_thread(self.fetch_new)
+            if not rows:
+                return added
+            added += self._apply(catalog, rows)
+
+    def sweep(self) -> int:
+        """Flushes, then trims the least used (oldest first on ties) spots beyond `max_spots`."""
+        self.flush()
+        with self._lock:
+            conn = self._connection()
+            count = conn.execute("SELECT COUNT(*) FROM learned_spots").fetchone()[0]
+            if count <= self.max_spots:
+                return 0
+            removed = conn.execute(
+                "DELETE FROM learned_spots WHERE id IN (SELECT id FROM learned_spots ORDER BY uses ASC, last_used_at ASC LIMIT ?)",
+                (count - self.max_spots,),
+            ).rowcount
+        self.trimmed += removed
+        return removed
+
+    def size(self) -> int:
+        with self._lock:
+            return self._connection().execute("SELECT COUNT(*) FROM learned_spots").fetchone()[0]
+
+    async def aclose(self):
+        await self._flusher.aclose()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": self.size(),
+            "max_spots": self.max_spots,
+            "loaded": self.loaded,
+            "written": self.written,
+            "duplicates": self.duplicates,
+            "trimmed": self.trimmed,
+            "pending": self._pending_count(),
+        }
@@ -0,0 +1,126 @@
+import logging
+from itertools import combinations
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from backend.model.models import UserPreferences
+from backend.utils.spot_catalog import SpotCatalog, interest_categories, normalize_name
+
+EVENTS_PER_PLAN = 3
+IDEAL_DURATION_MINUTES = 120
+
+
+class LocalPlan:
+    """A plan assembled from the local catalog, with the score used for local-first serving."""
+
+    def __init__(self, spots: List[dict], score: float):
+        self.spots = spots
+        self.score = score
+
+
+class LocalPlanner:
+    """
+    Constraint-based plan search over the SpotCatalog.
+
+    Spot features (cost, duration, category, learned flag) are held in NumPy arrays that are
+    rebuilt only when the catalog changes. Each request scores every spot in one vectorized
+    pass, keeps the top `max_candidates`, then scores all 3-spot combinations of those at
+    once and returns the best one that fits the budget without duplicate venues.
+    """
+
+    def __init__(self, catalog: SpotCatalog, max_candidates: int = 40, cheapest_candidates: int = 10, jitter: float = 0.15, seed: Optional[int] = None):
+        self.catalog = catalog
+        self.max_candidates = max_candidates
+        self.cheapest_candidates = cheapest_candidates
+        self.jitter = jitter
+        self._rng = np.random.default_rng(seed)
+        self._version = -1
+        self._spots: List[dict] = []
+        self._combinations: Dict[int, np.ndarray] = {}
+
+    def _rebuild(self):
+        categories = self.catalog.categories()
+        self._spots = []
+        category_ids, name_ids, learned = [], [], []
+        name_lookup: Dict[str, int] = {}
+        for category_id, category in enumerate(categories):
+            for spot in self.catalog.spots(category):
+                key = normalize_name(spot["name"])
+                self._spots.append(spot)
+                category_ids.append(category_id)
+                name_ids.append(name_lookup.setdefault(key, len(name_lookup)))
+                learned.append(self.catalog.is_learned(spot["name"]))
+        self._category_index = {category: i for i, category in enumerate(categories)}
+        self._costs = np.array([spot["cost"] for spot in self._spots], dtype=np.float64)
+        self._durations = np.array([spot["duration"] for spot in self._spots], dtype=np.float64)
+        self._category_ids = np.array(category_ids, dtype=np.int32)
+        self._name_ids = np.array(name_ids, dtype=np.int32)
+        self._learned = np.array(learned, dtype=bool)
+        self._version = self.catalog.version
+        logging.info("Local planner indexed %d spots across %d categories.", len(self._spots), len(categories))
+
+    def _combinations_for(self, size: int) -> np.ndarray:
+        if size not in self._combinations:
+            self._combinations[size] = np.array(list(combinations(range(size), EVENTS_PER_PLAN)), dtype=np.int32).reshape(-1, EVENTS_PER_PLAN)
+        return self._combinations[size]
+
+    def _interest_matrix(self, interests: List[str]) -> np.ndarray:
+        """Boolean (n_spots, n_interests) matrix: does spot i satisfy interest j."""
+        columns = []
+        for interest in interests:
+            categories = interest_categories(interest)
+            wanted = [self._category_index[c] for c in categories if c in self._category_index]
+            columns.append(np.isin(self._category_ids, wanted))
+        if not columns:
+            return np.ones((len(self._spots), 1), dtype=bool)
+        return np.stack(columns, axis=1)
+
+    def plan(self, preferences: UserPreferences) -> Optional[LocalPlan]:
+        if self._version != self.catalog.version:
+            self._rebuild()
+        if len(self._spots) < EVENTS_PER_PLAN:
+            return None
+
+        interest_matrix = self._interest_matrix(preferences.interests)
+        affordable = self._costs <= preferences.budget
+        if affordable.sum() < EVENTS_PER_PLAN:
+            logging.info("Local planner found fewer than %d spots within budget %s.", EVENTS_PER_PLAN, preferences.budget)
+            return None
+
+        # Per-spot score in [0, 1].
+        interest_match = interest_matrix.any(axis=1).astype(np.float64)
+        mode_match = (self._learned if preferences.mode == "surprise" else ~self._learned).astype(np.float64)
+        duration_fit = np.clip(1.0 - np.abs(self._durations - IDEAL_DURATION_MINUTES) / (2 * IDEAL_DURATION_MINUTES), 0.0, 1.0)
+        spot_scores = 0.6 * interest_match + 0.25 * mode_match + 0.15 * duration_fit
+
+        # Jitter only affects which candidates are considered, so repeat requests vary.
+        ranking = np.where(affordable, spot_scores + self._rng.uniform(0.0, self.jitter, len(spot_scores)), -np.inf)
+        affordable_count = int(affordable.sum())
+        top_count = min(self.max_candidates, affordable_count)
+        cheap_count = min(self.cheapest_candidates, affordable_count)
+        # Always include the cheapest spots so tight budgets still have feasible combinations.
+        candidates = np.union1d(
+            np.argpartition(-ranking, top_count - 1)[:top_count],
+            np.argpartition(np.where(affordable, self._costs, np.inf), cheap_count - 1)[:cheap_count],
+        )
+
+        triples = candidates[self._combinations_for(len(candidates))]
+        total_costs = self._costs[triples].sum(axis=1)
+        names = self._name_ids[triples]
+        distinct_names = (names[:, 0] != names[:, 1]) & (names[:, 0] != names[:, 2]) & (names[:, 1] != names[:, 2])
+        valid = (total_costs <= preferences.budget) & distinct_names
+        if not valid.any():
+            logging.info("Local planner found no duplicate-free combination within budget.")
+            return None
+
+        category_ids = self._category_ids[triples]
+        distinct_categories = 1 + (category_ids[:, 0] != category_ids[:, 1]) + ((category_ids[:, 2] != category_ids[:, 0]) & (category_ids[:, 2] != category_ids[:, 1]))
+        coverage = interest_matrix[triples].any(axis=1).mean(axis=1)
+        plan_scores = 0.5 * coverage + 0.4 * spot_scores[triples].mean(axis=1) + 0.1 * distinct_categories / EVENTS_PER_PLAN
+        ranked_scores = plan_scores + ranking[triples].sum(axis=1) * 1e-3
+        best = int(np.argmax(np.where(valid, ranked_scores, -np.inf)))
+
+        spots = [self._spots[i] for i in triples[best]]
+        return LocalPlan(spots=spots, score=round(float(plan_scores[best]), 4))
+
@@ -0,0 +1,151 @@
+"""
+Non-blocking logging for the request path: loggers only enqueue records, and a
+QueueListener thread formats and writes them, so file I/O and log rotation never run on
+the event loop.
+
+- messages are formatted in the listener thread, so %-style arguments cost nothing when
+  the level is filtered out and little when it is not
+- large payloads such as LLM responses are wrapped in `Payload`, which truncates them when
+  formatted; logged with `extra=SAMPLED`, only a sample of them is kept at all
+- records carry the request's outing_id (see `bind_outing_id`) and are written as JSON lines
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from itertools import count
+from typing import Dict, List, Optional, Union
+
+outing_id_var: ContextVar[Optional[str]] = ContextVar("outing_id", default=None)
+
+# Pass as `extra` to subject a record to payload sampling.
+SAMPLED = {"sampled": True}
+
+
+def bind_outing_id(outing_id: str):
+    """Tags every record logged from the current request, and the tasks it starts, with `outing_id`."""
+    outing_id_var.set(outing_id)
+
+
+@contextmanager
+def outing_scope(outing_id: Optional[str] = None):
+    """Limits `bind_outing_id` to a block, e.g. one request handler, and binds `outing_id` if given."""
+    token = outing_id_var.set(outing_id)
+    try:
+        yield
+    finally:
+        outing_id_var.reset(token)
+
+
+class Payload:
+    """Log argument for large text; it is only truncated and copied when the record is formatted."""
+
+    __slots__ = ("text", "max_chars")
+    default_max_chars = 500
+
+    def __init__(self, text: object, max_chars: Optional[int] = None):
+        self.text = text
+        self.max_chars = max_chars
+
+    def __str__(self) -> str:
+        text = str(self.text)
+        limit = self.default_max_chars if self.max_chars is None else self.max_chars
+        if len(text) <= limit:
+            return text
+        return f"{text[:limit]}... [{len(text) - limit} more chars]"
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message, outing_id and exception when present."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        outing_id = getattr(record, "outing_id", None)
+        if outing_id:
+            entry["outing_id"] = outing_id
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueues records without formatting them and drops them (counting) when the queue is full,
+    so a slow disk degrades logging rather than request latency.
+    """
+
+    def __init__(self, log_queue: queue.Queue, payload_sample_rate: float = 1.0):
+        super().__init__(log_queue)
+        self.payload_sample_rate = payload_sample_rate
+        self._sampled_calls = count()
+        self._traceback_formatter = logging.Formatter()
+        self.dropped = 0
+        self.sampled_out = 0
+
+    def _keep_sample(self) -> bool:
+        # Deterministic 1-in-N: keeps a record whenever the running total crosses a whole number.
+        n = next(self._sampled_calls)
+        return int((n + 1) * self.payload_sample_rate) > int(n * self.payload_sample_rate)
+
+    def emit(self, record: logging.LogRecord):
+        if getattr(record, "sampled", False) and not self._keep_sample():
+            self.sampled_out += 1
+            return
+        super().emit(record)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Runs on the caller's thread, so only capture what cannot wait: the request context,
+        # and the traceback (rendered now so the record does not keep its frames alive).
+        record.outing_id = outing_id_var.get()
+        if record.exc_info:
+            record.exc_text = self._traceback_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogPipeline:
+    """Routes a logger through a NonBlockingQueueHandler to `handlers`, which run on the listener thread."""
+
+    def __init__(self, handlers: List[logging.Handler], queue_size: int = 10000, payload_sample_rate: float = 1.0, payload_max_chars: Optional[int] = None):
+        self.queue: queue.Queue = queue.Queue(queue_size)
+        self.handler = NonBlockingQueueHandler(self.queue, payload_sample_rate)
+        self.listener = logging.handlers.QueueListener(self.queue, *handlers, respect_handler_level=True)
+        if payload_max_chars is not None:
+            Payload.default_max_chars = payload_max_chars
+
+    def install(self, logger: logging.Logger, level: Union[int, str] = logging.INFO):
+        """Replaces the logger's handlers with the queue and starts the listener; it is stopped (and drained) at exit."""
+        logger.setLevel(level)
+        if logger.hasHandlers():
+            logger.handlers.clear()
+        logger.addHandler(self.handler)
+        self.listener.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        if self.listener._thread is not None:
+            self.listener.stop()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self.queue.qsize(),
+            "dropped": self.handler.dropped,
+            "sampled_out": self.handler.sampled_out,
+        }
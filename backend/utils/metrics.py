@@ -0,0 +1,161 @@
+import bisect
+import os
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Seconds; covers cache lookups (sub-ms) up to slow LLM calls.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+# A collector returns (name, type, help, [(labels, value), ...]) families at scrape time.
+Collector = Callable[[], Iterable[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, enabled: bool = True):
+        self.name = name
+        self.help_text = help_text
+        self.enabled = enabled
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        if not self.enabled:
+            return
+        key = tuple(sorted(labels.items()))
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_format_labels(labels)} {_format_value(value)}" for labels, value in self._values.items()]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, enabled: bool = True):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.enabled = enabled
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Labels, list] = {}
+
+    def observe(self, value: float, **labels: str):
+        if not self.enabled:
+            return
+        key = tuple(sorted(labels.items()))
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in self._series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(labels, ('le', _format_value(bound)))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+class _StageTimer:
+    __slots__ = ("histogram", "labels", "started")
+
+    def __init__(self, histogram: Histogram, labels: Dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+class _NoopTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NOOP_TIMER = _NoopTimer()
+
+
+class MetricsRegistry:
+    """
+    Minimal in-process metrics with Prometheus text exposition.
+    Metrics are registered once with counter()/histogram() and recorded through the returned
+    object. Recording is a dict lookup plus a bisect, cheap enough to leave on in production;
+    set METRICS_ENABLED=false to turn every timer and counter into a no-op.
+    """
+
+    def __init__(self, enabled: Optional[bool] = None):
+        self.enabled = os.getenv("METRICS_ENABLED", "true").lower() == "true" if enabled is None else enabled
+        self._metrics: Dict[str, object] = {}
+        self._collectors: List[Collector] = []
+        self.stage_seconds = self.histogram("onestop_stage_duration_seconds", "Latency of request stages by route and stage.")
+        self.request_seconds = self.histogram("onestop_request_duration_seconds", "End-to-end handler latency by route.")
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        if name not in self._metrics:
+            self._metrics[name] = Counter(name, help_text, self.enabled)
+        return self._metrics[name]
+
+    def histogram(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        if name not in self._metrics:
+            self._metrics[name] = Histogram(name, help_text, buckets, self.enabled)
+        return self._metrics[name]
+
+    def stage(self, route: str, stage: str):
+        """Context manager timing one stage of a request into onestop_stage_duration_seconds."""
+        if not self.enabled:
+            return _NOOP_TIMER
+        return _StageTimer(self.stage_seconds, {"route": route, "stage": stage})
+
+    def request(self, route: str):
+        if not self.enabled:
+            return _NOOP_TIMER
+        return _StageTimer(self.request_seconds, {"route": route})
+
+    def register_collector(self, collector: Collector):
+        """Adds a callback whose values (e.g. cache stats) are read at scrape time."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines += metric.render()
+        for collector in self._collectors:
+            for name, metric_type, help_text, samples in collector():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for labels, value in samples:
+                    if value is None:
+                        continue
+                    lines.append(f"{name}{_format_labels(tuple(sorted(labels.items())))} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
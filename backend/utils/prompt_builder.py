@@ -0,0 +1,205 @@
+import heapq
+import textwrap
+from itertools import islice
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple
+
+from backend.model.models import Event, UserPreferences
+from backend.utils.spot_catalog import SpotCatalog, classify_category, interest_categories, normalize_name
+
+# Gemini averages roughly four characters of English text per token.
+CHARS_PER_TOKEN = 4
+# Each listed name costs at least one character plus its ", " separator.
+MIN_EXCLUSION_CHARS = 3
+
+# Static instructions go first so every prompt of a kind shares the same prefix; only the
+# request-specific lines after it change between calls.
+PLAN_PREFIX = textwrap.dedent("""\
+    You are a Dublin tour planner API. Your entire response must be only the raw JSON text.
+    IMPORTANT: Respond with ONLY a valid JSON array of objects, with no introductory text, no markdown, and no explanations.
+    Example format:
+    [
+        {"type": "Breakfast", "name": "The Early Bird Café", "cost": 15, "duration": 60},
+        {"type": "Activity", "name": "A lesser-known gallery", "cost": 0, "duration": 120},
+        {"type": "Lunch", "name": "A unique food market", "cost": 25, "duration": 75}
+    ]
+    """)
+
+REPLACEMENT_PREFIX = textwrap.dedent("""\
+    You are a Dublin tour planner API. Your entire response must be only the raw JSON text.
+    IMPORTANT: Respond with ONLY a single valid JSON object, with no introductory text, no markdown, and no explanations.
+    Example format:
+    {"type": "Pub", "name": "A hidden local pub", "cost": 20, "duration": 90}
+    """)
+
+BATCH_REPLACEMENT_PREFIX = textwrap.dedent("""\
+    You are a Dublin tour planner API. Your entire response must be only the raw JSON text.
+    IMPORTANT: Respond with ONLY a valid JSON array of objects, one per event to replace and in the same order, with no introductory text, no markdown, and no explanations.
+    Example format:
+    [{"type": "Pub", "name": "A hidden local pub", "cost": 20, "duration": 90}, {"type": "Activity", "name": "A quiet garden", "cost": 0, "duration": 60}]
+    """)
+
+CANDIDATES_PREFIX = textwrap.dedent("""\
+    You are a Dublin tour planner API. Your entire response must be only the raw JSON text.
+    IMPORTANT: Respond with ONLY a valid JSON array of arrays, where the i-th array holds the alternatives for event i, with no introductory text, no markdown, and no explanations.
+    Example format:
+    [[{"type": "Pub", "name": "A hidden local pub", "cost": 20, "duration": 90}], [{"type": "Activity", "name": "A quiet garden", "cost": 0, "duration": 60}]]
+    """)
+
+PLAN_MODE_INSTRUCTIONS = {"surprise": "Focus on quirky, offbeat gems.", "must-see": "Focus on iconic, popular landmarks."}
+REPLACEMENT_MODE_INSTRUCTIONS = {"surprise": "Suggest a quirky, offbeat alternative.", "must-see": "Suggest an iconic or popular alternative."}
+CANDIDATES_MODE_INSTRUCTIONS = {"surprise": "Suggest quirky, offbeat alternatives.", "must-see": "Suggest iconic or popular alternatives."}
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+class Prompt:
+    """A built prompt plus the size figures reported for each LLM call."""
+
+    def __init__(self, kind: str, text: str, exclusions: int, exclusions_available: int):
+        self.kind = kind
+        self.text = text
+        self.exclusions = exclusions
+        self.exclusions_available = exclusions_available
+        self.estimated_tokens = estimate_tokens(text)
+
+    def payload(self) -> dict:
+        return {"contents": [{"parts": [{"text": self.text}]}]}
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "chars": len(self.text),
+            "estimated_tokens": self.estimated_tokens,
+            "exclusions": self.exclusions,
+            "exclusions_available": self.exclusions_available,
+        }
+
+
+class PromptBuilder:
+    """
+    Builds Gemini prompts whose exclusion lists fit a token budget however large the catalog
+    grows. Exclusions are the catalog venues the model is most likely to suggest for this
+    request: spots in the requested categories first, then ones matching the interests,
+    with the mode deciding whether shipped landmarks ("must-see") or venues learned from
+    earlier LLM answers ("surprise") rank higher. Venues that do not fit are caught by
+    `is_excluded` on the model's output instead.
+    """
+
+    def __init__(self, catalog: SpotCatalog, max_exclusion_tokens: int = 400, max_cached_rankings: int = 64):
+        self.catalog = catalog
+        self.max_exclusion_tokens = max_exclusion_tokens
+        self.max_cached_rankings = max_cached_rankings
+        # No more names than this can fit the budget, so rankings stop there.
+        self._ranking_limit = max_exclusion_tokens * CHARS_PER_TOKEN // MIN_EXCLUSION_CHARS
+        self._rankings: Dict[Tuple[FrozenSet[str], FrozenSet[str], str], List[str]] = {}
+        self._ranking_version = -1
+
+    @staticmethod
+    def _scored(spots: Iterable[dict], score: int) -> Iterator[Tuple[int, int, str]]:
+        return ((score, order, spot["name"]) for order, spot in enumerate(spots))
+
+    def _ranked_names(self, target_categories: FrozenSet[str], interest_targets: FrozenSet[str], mode: str) -> List[str]:
+        if self._ranking_version != self.catalog.version:
+            self._rankings.clear()
+            self._ranking_version = self.catalog.version
+        key = (target_categories, interest_targets, mode)
+        ranked = self._rankings.get(key)
+        if ranked is not None:
+            return ranked
+
+        # Each (category, origin) list is already in rank order, so merging them lazily yields
+        # the top names without scoring or sorting the whole catalog.
+        sources = []
+        for category in self.catalog.categories():
+            category_score = (2 if category in target_categories else 0) + (1 if category in interest_targets else 0)
+            for learned in (False, True):
+                mode_score = 1 if learned == (mode == "surprise") else 0
+                spots = self.catalog.spots_by_origin(category, learned)
+                # Newer learned spots first: they reflect what the model currently tends to answer.
+                sources.append(self._scored(reversed(spots) if learned else spots, -(category_score + mode_score)))
+        ranked = [name for _, _, name in islice(heapq.merge(*sources), self._ranking_limit)]
+        if len(self._rankings) >= self.max_cached_rankings:
+            self._rankings.pop(next(iter(self._rankings)))
+        self._rankings[key] = ranked
+        return ranked
+
+    def select_exclusions(self, target_categories: Iterable[str], interests: Iterable[str], mode: str, always: Iterable[str] = ()) -> List[str]:
+        """`always` (e.g. the current plan) is listed first; the rest is filled by rank up to the budget."""
+        selected: List[str] = []
+        seen = set()
+        budget = self.max_exclusion_tokens * CHARS_PER_TOKEN
+        interest_targets = frozenset(category for interest in interests for category in interest_categories(interest))
+        for always_included, names in ((True, always), (False, self._ranked_names(frozenset(target_categories), interest_targets, mode))):
+            for name in names:
+                key = normalize_name(name)
+                if key in seen:
+                    continue
+                cost = len(name) + 2
+                if not always_included and cost > budget:
+                    return selected
+                seen.add(key)
+                selected.append(name)
+                budget -= cost
+        return selected
+
+    def plan_prompt(self, preferences: UserPreferences) -> Prompt:
+        targets = {category for interest in preferences.interests for category in interest_categories(interest)} | {"Food"}
+        exclusions = self.select_exclusions(targets, preferences.interests, preferences.mode)
+        text = PLAN_PREFIX + textwrap.dedent(f"""\
+            Plan a 3-event day in Dublin based on these user preferences:
+            - Mode: {preferences.mode}
+            - Budget: {preferences.budget}
+            - Interests: {', '.join(preferences.interests)}
+            Instruction: {PLAN_MODE_INSTRUCTIONS.get(preferences.mode, PLAN_MODE_INSTRUCTIONS['must-see'])}
+            CRITICAL INSTRUCTION: Do not suggest any of the following well-known places: {', '.join(exclusions)}.
+            """)
+        return Prompt("plan", text, len(exclusions), len(self.catalog))
+
+    def replacement_prompt(self, plan: List[Event], index: int, preferences: UserPreferences) -> Prompt:
+        event_to_replace = plan[index]
+        exclusions = self.select_exclusions({classify_category(event_to_replace.type)}, preferences.interests, preferences.mode, always=[event.name for event in plan])
+        text = REPLACEMENT_PREFIX + textwrap.dedent(f"""\
+            A user wants to replace one event in their plan.
+            - Event to Replace: "{event_to_replace.name}"
+            - User Interests: {', '.join(preferences.interests)}
+            - Planning Mode: {preferences.mode}
+            Instruction: {REPLACEMENT_MODE_INSTRUCTIONS.get(preferences.mode, REPLACEMENT_MODE_INSTRUCTIONS['must-see'])}
+            CRITICAL INSTRUCTION: The new event must not be in the following list: {', '.join(exclusions)}.
+            """)
+        return Prompt("replacement", text, len(exclusions), len(self.catalog) + len(plan))
+
+    def batch_replacement_prompt(self, plan: List[Event], indices: List[int], preferences: UserPreferences) -> Prompt:
+        targets = {classify_category(plan[index].type) for index in indices}
+        exclusions = self.select_exclusions(targets, preferences.interests, preferences.mode, always=[event.name for event in plan])
+        replace_lines = "\n".join(f"{position}. {plan[index].type}: {plan[index].name}" for position, index in enumerate(indices))
+        text = BATCH_REPLACEMENT_PREFIX + (
+            f"A user wants to replace {len(indices)} events in their plan, each with a different new event of the same kind:\n"
+            f"{replace_lines}\n"
+            f"- User Interests: {', '.join(preferences.interests)}\n"
+            f"- Planning Mode: {preferences.mode}\n"
+            f"Instruction: {REPLACEMENT_MODE_INSTRUCTIONS.get(preferences.mode, REPLACEMENT_MODE_INSTRUCTIONS['must-see'])}\n"
+            f"CRITICAL INSTRUCTION: Respond with {len(indices)} objects. No new event may repeat or be in the following list: {', '.join(exclusions)}.\n"
+        )
+        return Prompt("batch_replacement", text, len(exclusions), len(self.catalog) + len(plan))
+
+    def candidates_prompt(self, plan: List[Event], preferences: UserPreferences, per_slot: int) -> Prompt:
+        targets = {classify_category(event.type) for event in plan}
+        exclusions = self.select_exclusions(targets, preferences.interests, preferences.mode, always=[event.name for event in plan])
+        plan_lines = "\n".join(f"{index}. {event.type}: {event.name}" for index, event in enumerate(plan))
+        text = CANDIDATES_PREFIX + (
+            f"For each event in this plan, suggest {per_slot} different alternative events of the same kind:\n"
+            f"{plan_lines}\n"
+            f"- User Interests: {', '.join(preferences.interests)}\n"
+            f"- Planning Mode: {preferences.mode}\n"
+            f"Instruction: {CANDIDATES_MODE_INSTRUCTIONS.get(preferences.mode, CANDIDATES_MODE_INSTRUCTIONS['must-see'])}\n"
+            f"CRITICAL INSTRUCTION: Respond with {len(plan)} arrays. No suggestion may be in the following list, and no suggestion may repeat: {', '.join(exclusions)}.\n"
+        )
+        return Prompt("candidates", text, len(exclusions), len(self.catalog) + len(plan))
+
+    def is_excluded(self, name: str, plan: Optional[List[Event]] = None) -> bool:
+        """Post-filter for model output: O(1) check against the whole catalog index and the current plan."""
+        if self.catalog.contains(name):
+            return True
+        key = normalize_name(name)
+        return any(normalize_name(event.name) == key for event in plan or ())
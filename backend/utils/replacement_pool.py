@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Dict, Iterable, List, Optional
+
+from backend.model.models import Event, UserPreferences
+from backend.utils.spot_catalog import normalize_name
+
+# Builds replacement candidates for every slot of a plan: {slot index: [Event, ...]}.
+# The last argument says whether the LLM may be asked (False for plans built from local data).
+CandidateFetcher = Callable[[List[Event], UserPreferences, int, bool], Awaitable[Dict[int, List[Event]]]]
+
+
+class _SessionPool:
+    def __init__(self, expires_at: float):
+        self.expires_at = expires_at
+        self.slots: Dict[int, Deque[Event]] = {}
+        self.task: Optional[asyncio.Task] = None
+
+    def cancel(self):
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+
+
+class ReplacementPool:
+    """
+    Per-outing pools of pre-fetched replacement events, filled in the background right after
+    a plan is served so that regeneration is usually just a pop.
+
+    Sessions expire after `ttl_seconds`, at most `max_sessions` are kept (least recently used
+    are evicted) and expired or evicted sessions have their background work cancelled.
+    """
+
+    def __init__(self, fetch_candidates: CandidateFetcher, per_slot: int = 3, ttl_seconds: float = 1800.0, max_sessions: int = 1000, max_concurrent_fills: int = 4):
+        self.fetch_candidates = fetch_candidates
+        self.per_slot = per_slot
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.max_concurrent_fills = max_concurrent_fills
+        self._sessions: "OrderedDict[str, _SessionPool]" = OrderedDict()
+        self._semaphore = asyncio.Semaphore(max_concurrent_fills)
+        self.fills = 0
+        self.fill_failures = 0
+        self.pops = 0
+        self.empty_pops = 0
+        self.cancelled = 0
+
+    def _drop(self, outing_id: str):
+        session = self._sessions.pop(outing_id, None)
+        if session is not None and session.task is not None and not session.task.done():
+            session.cancel()
+            self.cancelled += 1
+
+    def sweep(self) -> int:
+        now = time.monotonic()
+        expired = [outing_id for outing_id, session in self._sessions.items() if session.expires_at <= now]
+        for outing_id in expired:
+            self._drop(outing_id)
+        return len(expired)
+
+    async def _fill(self, outing_id: str, plan: List[Event], preferences: UserPreferences, use_llm: bool):
+        async with self._semaphore:
+            if outing_id not in self._sessions:
+                return
+            try:
+                candidates = await self.fetch_candidates(plan, preferences, self.per_slot, use_llm)
+            except Exception as e:
+                self.fill_failures += 1
+                logging.warning("Prefetching replacements failed for outing_id %s. Error: %s", outing_id, e)
+                return
+        session = self._sessions.get(outing_id)
+        if session is None:
+            return
+        for index, events in candidates.items():
+            session.slots[index] = deque(events[:self.per_slot])
+        self.fills += 1
+        logging.info("Prefetched %d replacement candidates for outing_id %s.", sum(len(slot) for slot in session.slots.values()), outing_id)
+
+    def schedule(self, outing_id: str, plan: List[Event], preferences: UserPreferences, use_llm: bool = True):
+        """Starts filling the pool for a new outing in the background; `use_llm` is passed to `fetch_candidates`."""
+        if self.per_slot <= 0:
+            return
+        self.sweep()
+        self._drop(outing_id)
+        while len(self._sessions) >= self.max_sessions:
+            self._drop(next(iter(self._sessions)))
+        session = _SessionPool(time.monotonic() + self.ttl_seconds)
+        self._sessions[outing_id] = session
+        plan_snapshot = [event.model_copy() for event in plan]
+        session.task = asyncio.get_running_loop().create_task(self._fill(outing_id, plan_snapshot, preferences, use_llm))
+
+    def pop(self, outing_id: str, index: int, exclude: Iterable[str] = ()) -> Optional[Event]:
+        """Returns a ready replacement for slot `index` whose name is not in `exclude`, if one is pooled."""
+        session = self._sessions.get(outing_id)
+        if session is None or session.expires_at <= time.monotonic():
+            self._drop(outing_id)
+            self.empty_pops += 1
+            return None
+        self._sessions.move_to_end(outing_id)
+        excluded = {normalize_name(name) for name in exclude}
+        slot = session.slots.get(index)
+        while slot:
+            candidate = slot.popleft()
+            if normalize_name(candidate.name) not in excluded:
+                self.pops += 1
+                return candidate.model_copy()
+        self.empty_pops += 1
+        return None
+
+    def discard(self, outing_id: str):
+        """Drops a session's pool, e.g. once it can no longer regenerate."""
+        self._drop(outing_id)
+
+    async def aclose(self):
+        tasks = [session.task for session in self._sessions.values() if session.task is not None]
+        for outing_id in list(self._sessions):
+            self._drop(outing_id)
+        # Wait for cancelled fills so none of them reopens an upstream client after shutdown.
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "sessions": len(self._sessions),
+            "pooled_candidates": sum(len(slot) for session in self._sessions.values() for slot in session.slots.values()),
+            "fills": self.fills,
+            "fill_failures": self.fill_failures,
+            "pops": self.pops,
+            "empty_pops": self.empty_pops,
+            "cancelled": self.cancelled,
+        }
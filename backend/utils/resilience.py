@@ -0,0 +1,271 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Callable, Deque, Dict, Optional
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the upstream while the circuit breaker is open."""
+
+
+class DeadlineExceededError(Exception):
+    """Raised when an upstream call does not finish within its latency deadline."""
+
+
+class QueueFullError(Exception):
+    """Raised when too many calls are already waiting for a concurrency slot."""
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive failures.
+    open -> half-open after `reset_timeout_seconds`; a single probe is let through.
+    half-open -> closed on probe success, back to open on probe failure.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout_seconds:
+            self.state = "half-open"
+            self._probe_in_flight = False
+        if self.state == "half-open" and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def release_probe(self):
+        """Lets another caller probe when the current probe ended without an upstream result."""
+        self._probe_in_flight = False
+
+    def record_success(self):
+        if self.state != "closed":
+            logging.info("Circuit breaker probe succeeded, closing circuit.")
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.state == "half-open" or self.consecutive_failures >= self.failure_threshold:
+            if self.state != "open":
+                self.times_opened += 1
+                logging.warning("Circuit breaker opened after %d consecutive failures.", self.consecutive_failures)
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+
+class ResilientCaller:
+    """
+    Guards calls to one upstream with a latency deadline, a circuit breaker, a bounded
+    concurrency limit (with a bounded wait queue) and optional hedging: when an attempt runs
+    past the observed p95 latency, a second attempt is started and the first success wins.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        deadline_seconds: float = 8.0,
+        max_concurrency: int = 16,
+        max_queue: int = 64,
+        breaker: Optional[CircuitBreaker] = None,
+        hedging: bool = False,
+        min_hedge_delay_seconds: float = 0.5,
+        latency_window: int = 200,
+    ):
+        self.name = name
+        self.deadline_seconds = deadline_seconds
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.breaker = breaker or CircuitBreaker()
+        self.hedging = hedging
+        self.min_hedge_delay_seconds = min_hedge_delay_seconds
+        self._latencies: Deque[float] = deque(maxlen=latency_window)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.deadline_exceeded = 0
+        self.rejected_open = 0
+        self.rejected_queue_full = 0
+        self.hedges_fired = 0
+        self.hedges_won = 0
+
+    def p95(self) -> Optional[float]:
+        if len(self._latencies) < 20:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def _admit(self):
+        self.calls += 1
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            self.rejected_queue_full += 1
+            raise QueueFullError(f"Too many queued calls to {self.name}.")
+        if not self.breaker.allow():
+            self.rejected_open += 1
+            raise CircuitOpenError(f"Circuit for {self.name} is open.")
+
+    def _record(self, ok: bool, started: float):
+        if ok:
+            self.successes += 1
+            self._latencies.append(time.monotonic() - started)
+            self.breaker.record_success()
+        else:
+            self.failures += 1
+            self.breaker.record_failure()
+
+    async def _acquire(self, timeout: Optional[float]):
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+            self.in_flight += 1
+            return
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.deadline_exceeded += 1
+            self.breaker.release_probe()
+            raise DeadlineExceededError(f"Deadline passed while waiting for a {self.name} slot.")
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+
+    def _release(self):
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    async def _run_hedged(self, work: Callable[[], Awaitable[Any]]) -> Any:
+        first = asyncio.ensure_future(work())
+        p95 = self.p95()
+        if not self.hedging or p95 is None:
+            return await first
+        tasks = {first}
+        hedge = None
+        hedge_slot = False
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=max(p95, self.min_hedge_delay_seconds))
+            if not done and not self._semaphore.locked():
+                # Hedge only with spare capacity so hedging never adds queueing.
+                await self._semaphore.acquire()
+                hedge_slot = True
+                self.hedges_fired += 1
+                hedge = asyncio.ensure_future(work())
+                tasks.add(hedge)
+            last_error: Optional[BaseException] = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedges_won += 1
+                        return task.result()
+                    last_error = task.exception()
+            raise last_error
+        finally:
+            for task in (first, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+            if hedge_slot:
+                self._semaphore.release()
+
+    async def call(self, work: Callable[[], Awaitable[Any]], deadline_seconds: Optional[float] = None) -> Any:
+        """Runs `work()` under the guard; raises CircuitOpenError, QueueFullError or DeadlineExceededError."""
+        self._admit()
+        deadline = self.deadline_seconds if deadline_seconds is None else deadline_seconds
+        deadline_at = time.monotonic() + deadline
+        await self._acquire(deadline)
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(self._run_hedged(work), timeout=max(deadline_at - time.monotonic(), 0.0))
+        except asyncio.TimeoutError:
+            self.deadline_exceeded += 1
+            self._record(False, started)
+            raise DeadlineExceededError(f"{self.name} call exceeded its {deadline}s deadline.")
+        except asyncio.CancelledError:
+            self.breaker.release_probe()
+            raise
+        except Exception:
+            self._record(False, started)
+            raise
+        finally:
+            self._release()
+        self._record(True, started)
+        return result
+
+    @asynccontextmanager
+    async def slot(self, queue_timeout_seconds: Optional[float] = None) -> AsyncIterator[None]:
+        """Breaker and concurrency guard for calls that cannot be wrapped whole, e.g. streams."""
+        self._admit()
+        await self._acquire(self.deadline_seconds if queue_timeout_seconds is None else queue_timeout_seconds)
+        started = time.monotonic()
+        try:
+            yield
+        except Exception:
+            self._record(False, started)
+            raise
+        except BaseException:
+            # Cancelled, or the stream was closed early (GeneratorExit): no upstream result either way.
+            self.breaker.release_probe()
+            raise
+        else:
+            self._record(True, started)
+        finally:
+            self._release()
+
+    async def stream(self, open_chunks: Callable[[], AsyncGenerator[Any, None]], deadline_seconds: Optional[float] = None) -> AsyncIterator[Any]:
+        """
+        Yields from `open_chunks()` under the guard. The whole stream, including the wait for a
+        slot, must finish within the deadline or DeadlineExceededError is raised mid-stream.
+        """
+        deadline = self.deadline_seconds if deadline_seconds is None else deadline_seconds
+        deadline_at = time.monotonic() + deadline
+        async with self.slot(deadline):
+            chunks = open_chunks()
+            try:
+                while True:
+                    try:
+                        async with asyncio.timeout(max(deadline_at - time.monotonic(), 0.0)):
+                            chunk = await anext(chunks)
+                    except StopAsyncIteration:
+                        break
+                    except TimeoutError:
+                        self.deadline_exceeded += 1
+                        raise DeadlineExceededError(f"{self.name} stream exceeded its {deadline}s deadline.")
+                    yield chunk
+            finally:
+                await chunks.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        p95 = self.p95()
+        return {
+            "circuit_state": self.breaker.state,
+            "consecutive_failures": self.breaker.consecutive_failures,
+            "times_opened": self.breaker.times_opened,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "calls": self.calls,
+            "successes": self.successes,
+            "failures": self.failures,
+            "deadline_exceeded": self.deadline_exceeded,
+            "rejected_open": self.rejected_open,
+            "rejected_queue_full": self.rejected_queue_full,
+            "hedges_fired": self.hedges_fired,
+            "hedges_won": self.hedges_won,
+            "p95_seconds": round(p95, 4) if p95 is not None else None,
+        }
@@ -0,0 +1,96 @@
+"""
+Precompiled startup snapshot: the fully indexed SpotCatalog (pickled, so loading skips
+re-indexing and re-sorting) and a copy of the learned image cache (SQLite, opened with
+mmap on first use). Build it before deploying:
+
+    python -m backend.utils.snapshot --images /tmp/learned_images.db
+"""
+import argparse
+import hashlib
+import logging
+import os
+import pickle
+import sqlite3
+from typing import Optional
+
+from backend.utils import popular_spots
+from backend.utils.spot_catalog import SpotCatalog
+
+SNAPSHOT_FORMAT = 3
+DEFAULT_SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "snapshot")
+CATALOG_FILE = "catalog.pickle"
+IMAGES_FILE = "images.db"
+
+
+def source_digest() -> str:
+    """Fingerprint of popular_spots.py; a snapshot built from other data is ignored."""
+    with open(popular_spots.__file__, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def write_catalog_snapshot(catalog: SpotCatalog, path: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump({"format": SNAPSHOT_FORMAT, "source": source_digest(), "catalog": catalog}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def load_catalog_snapshot(path: str) -> Optional[SpotCatalog]:
+    """Returns the snapshotted catalog, or None when it is missing, stale or unreadable."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as f:
+            snapshot = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError) as e:
+        logging.warning("Could not read catalog snapshot '%s'. Error: %s", path, e)
+        return None
+    if snapshot.get("format") != SNAPSHOT_FORMAT or snapshot.get("source") != source_digest():
+        logging.warning("Catalog snapshot '%s' is out of date, rebuilding from popular spots.", path)
+        return None
+    return snapshot["catalog"]
+
+
+def load_spot_catalog(snapshot_dir: str = DEFAULT_SNAPSHOT_DIR) -> SpotCatalog:
+    catalog = load_catalog_snapshot(os.path.join(snapshot_dir, CATALOG_FILE))
+    if catalog is not None:
+        logging.info("Loaded spot catalog with %d spots from snapshot.", len(catalog))
+        return catalog
+    return SpotCatalog()
+
+
+def write_image_snapshot(source_path: str, path: str):
+    """Copies a live image cache database consistently (SQLite backup API, WAL-safe)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(tmp_path)
+    try:
+        source.backup(target)
+        target.execute("PRAGMA journal_mode=DELETE")
+        target.execute("VACUUM")
+    finally:
+        target.close()
+        source.close()
+    os.replace(tmp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the precompiled startup snapshot.")
+    parser.add_argument("--out", default=DEFAULT_SNAPSHOT_DIR)
+    parser.add_argument("--images", help="Image cache database to include (e.g. /tmp/learned_images.db).")
+    args = parser.parse_args()
+
+    catalog = SpotCatalog()
+    write_catalog_snapshot(catalog, os.path.join(args.out, CATALOG_FILE))
+    print(f"Wrote catalog snapshot with {len(catalog)} spots.")
+    if args.images:
+        write_image_snapshot(args.images, os.path.join(args.out, IMAGES_FILE))
+        print(f"Wrote image snapshot from '{args.images}'.")
+
+
+if __name__ == "__main__":
+    main()
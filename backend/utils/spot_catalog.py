@@ -0,0 +1,139 @@
+import bisect
+import logging
+import random
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from backend.utils.popular_spots import PopularSpots
+
+FOOD_TYPES = ["food", "lunch", "dinner", "breakfast", "treat"]
+
+# Which catalog categories satisfy each interest offered by the frontend.
+INTEREST_CATEGORIES: Dict[str, List[str]] = {
+    "food": ["Food"],
+    "history": ["Museum", "Historical Site", "Landmark", "Activity"],
+    "art": ["Museum", "Activity"],
+    "music": ["Entertainment", "Pub"],
+    "nightlife": ["Pub", "Entertainment"],
+    "shopping": ["Shopping"],
+}
+
+
+def interest_categories(interest: str) -> List[str]:
+    """Catalog categories that satisfy a frontend interest (unknown interests map to a same-named category)."""
+    return INTEREST_CATEGORIES.get(interest.strip().lower(), [interest.strip().title()])
+
+
+def classify_category(event_type: str) -> str:
+    """Maps a free-form event type (e.g. "Dinner", "Pub") to a catalog category."""
+    event_type = event_type.lower()
+    if "museum" in event_type:
+        return "Museum"
+    if "pub" in event_type:
+        return "Pub"
+    if any(food_type in event_type for food_type in FOOD_TYPES):
+        return "Food"
+    return "Activity"
+
+
+def normalize_name(name: str) -> str:
+    return " ".join(name.lower().split())
+
+
+class SpotCatalog:
+    """
+    Indexed view over the local spot dictionary.
+
+    - a normalized-name hash index for O(1) duplicate checks and lookups
+    - per-category arrays for O(1) random picks
+    - per-category (cost, position) arrays kept sorted, so budget-capped picks find their
+      cut-off with one O(log n) bisect (each insert shifts the array, so adds are O(n))
+    - per-category shipped and learned lists in insertion order, so rankings that treat
+      the two differently never have to scan and split a whole category
+    """
+
+    # Rejection-sampling attempts before falling back to a filtered scan.
+    MAX_PICK_ATTEMPTS = 8
+
+    def __init__(self, spots: Optional[Dict[str, List[dict]]] = None):
+        self._categories: Dict[str, List[dict]] = {}
+        self._by_cost: Dict[str, List[Tuple[int, int]]] = {}
+        self._keys: Set[Tuple[str, str]] = set()
+        self._names: Dict[str, dict] = {}
+        self._learned: Set[str] = set()
+        self._by_origin: Dict[Tuple[str, bool], List[dict]] = {}
+        # Bumped on every successful add so derived structures know when to rebuild.
+        self.version = 0
+        for category, category_spots in (spots if spots is not None else PopularSpots.spots).items():
+            self.add_category(category)
+            for spot in category_spots:
+                self.add(category, spot)
+
+    def add_category(self, category: str):
+        self._categories.setdefault(category, [])
+        self._by_cost.setdefault(category, [])
+
+    def categories(self) -> List[str]:
+        return list(self._categories)
+
+    def has_category(self, category: str) -> bool:
+        return category in self._categories
+
+    def contains(self, name: str, category: Optional[str] = None) -> bool:
+        key = normalize_name(name)
+        if category is None:
+            return key in self._names
+        return (category, key) in self._keys
+
+    def spots(self, category: str) -> List[dict]:
+        return self._categories.get(category, [])
+
+    def spots_by_origin(self, category: str, learned: bool) -> List[dict]:
+        """Spots of a category that were (or were not) added as learned, oldest first."""
+        return self._by_origin.get((category, learned), [])
+
+    def is_learned(self, name: str) -> bool:
+        return normalize_name(name) in self._learned
+
+    def add(self, category: str, spot: dict, learned: bool = False) -> bool:
+        """
+        Adds a spot to a category; returns False if the name is already in that category.
+        `learned` marks spots discovered at runtime rather than shipped in PopularSpots.
+        """
+        key = normalize_name(spot["name"])
+        if (category, key) in self._keys:
+            return False
+        category_spots = self._categories[category]
+        position = len(category_spots)
+        category_spots.append(spot)
+        bisect.insort(self._by_cost[category], (spot["cost"], position))
+        self._keys.add((category, key))
+        self._names.setdefault(key, spot)
+        self._by_origin.setdefault((category, learned), []).append(spot)
+        if learned:
+            self._learned.add(key)
+        self.version += 1
+        return True
+
+    def random_choice(self, category: str, exclude: Iterable[str] = (), max_cost: Optional[int] = None) -> Optional[dict]:
+        """
+        Picks a random spot from a category whose name is not in `exclude` and, if given,
+        costs at most `max_cost`. Expected O(1) when exclusions are a small share of the category.
+        """
+        category_spots = self._categories.get(category)
+        if not category_spots:
+            return None
+        excluded = {normalize_name(name) for name in exclude}
+        by_cost = self._by_cost[category]
+        end = len(by_cost) if max_cost is None else bisect.bisect_right(by_cost, (max_cost, float("inf")))
+        if end == 0:
+            return None
+        for _ in range(self.MAX_PICK_ATTEMPTS):
+            spot = category_spots[by_cost[random.randrange(end)][1]]
+            if normalize_name(spot["name"]) not in excluded:
+                return spot
+        valid_choices = [category_spots[position] for _, position in by_cost[:end] if normalize_name(category_spots[position]["name"]) not in excluded]
+        logging.info("Found %d local candidates in '%s' after filtering.", len(valid_choices), category)
+        return random.choice(valid_choices) if valid_choices else None
+
+    def __len__(self) -> int:
+        return sum(len(category_spots) for category_spots in self._categories.values())
@@ -0,0 +1,157 @@
+"""
+Cold-start helpers: deferred construction of expensive module-level objects, a log file
+handler that touches the disk only on first write, and startup timing.
+
+Run `python -m backend.utils.startup` for a per-module import cost report of api/index.py;
+it exits non-zero when the import exceeds COLD_START_TARGET_MS.
+"""
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+from typing import Any, Callable, Dict, List, Optional
+
+
+class StartupTimer:
+    """Records how long each startup phase (and each deferred object) took to build."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.phases: Dict[str, float] = {}
+
+    def mark(self, phase: str):
+        """Closes the phase that began at the previous mark."""
+        now = time.perf_counter()
+        self.phases[phase] = now - self._last
+        self._last = now
+
+    def record(self, phase: str, seconds: float):
+        self.phases[phase] = seconds
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "import_ms": round(1000 * (self._last - self.started), 2),
+            "phases_ms": {phase: round(1000 * seconds, 2) for phase, seconds in self.phases.items()},
+        }
+
+
+class Lazy:
+    """
+    Proxy that builds its object on first attribute access, so import stays cheap and
+    the cost lands on the first request that needs it (or on an explicit `get()`).
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Any], timer: Optional[StartupTimer] = None):
+        self._name = name
+        self._factory = factory
+        self._timer = timer
+        self._value: Any = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def get(self) -> Any:
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    started = time.perf_counter()
+                    self._value = self._factory()
+                    self._loaded = True
+                    if self._timer is not None:
+                        self._timer.record(f"lazy:{self._name}", time.perf_counter() - started)
+                    logging.info("Loaded %s on first use in %.1f ms.", self._name, 1000 * (time.perf_counter() - started))
+        return self._value
+
+    def __getattr__(self, attribute: str) -> Any:
+        return getattr(self.get(), attribute)
+
+    def __len__(self) -> int:
+        return len(self.get())
+
+    def __contains__(self, item: Any) -> bool:
+        return item in self.get()
+
+
+class DeferredRotatingFileHandler(RotatingFileHandler):
+    """RotatingFileHandler that creates its directory and opens the file on the first record."""
+
+    def __init__(self, filename: str, **kwargs):
+        super().__init__(filename, delay=True, **kwargs)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
+
+# "import time: self [us] | cumulative | imported package" lines from `python -X importtime`.
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def import_report(module: str = "api.index") -> Dict[str, Any]:
+    """Imports `module` in a fresh interpreter and returns the cost of each of its direct imports."""
+    import subprocess
+
+    code = f"import json, {module} as m; print(json.dumps(getattr(m, 'startup_timer', None) and m.startup_timer.report()))"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    entries = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append((len(indent), name, int(self_us), int(cumulative_us)))
+    # Children are listed before their parent; the target module's direct imports sit one level deeper.
+    target_index = next(index for index, entry in enumerate(entries) if entry[1] == module)
+    target_depth = entries[target_index][0]
+    modules: List[Dict[str, Any]] = []
+    for depth, name, self_us, cumulative_us in reversed(entries[:target_index]):
+        if depth <= target_depth:
+            break
+        if depth == target_depth + 2:
+            modules.append({"module": name, "self_ms": round(self_us / 1000, 2), "cumulative_ms": round(cumulative_us / 1000, 2)})
+    modules.sort(key=lambda entry: entry["cumulative_ms"], reverse=True)
+    return {
+        "module": module,
+        "total_ms": round(entries[target_index][3] / 1000, 2),
+        "module_body_ms": round(entries[target_index][2] / 1000, 2),
+        "imports": modules,
+        "startup_phases": json.loads(result.stdout.strip().splitlines()[-1]) if result.stdout.strip() else None,
+    }
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Report per-module import cost of the API entry point.")
+    parser.add_argument("--module", default="api.index")
+    parser.add_argument("--target-ms", type=float, default=float(os.getenv("COLD_START_TARGET_MS", "0")), help="Fail when the import takes longer (0 disables).")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+    args = parser.parse_args()
+
+    report = import_report(args.module)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{args.module}: {report['total_ms']} ms total, {report['module_body_ms']} ms in the module body")
+        for entry in report["imports"]:
+            print(f"  {entry['cumulative_ms']:>9.2f} ms  {entry['module']}")
+        if report["startup_phases"]:
+            for phase, ms in report["startup_phases"]["phases_ms"].items():
+                print(f"  phase {phase}: {ms} ms")
+    if args.target_ms and report["total_ms"] > args.target_ms:
+        print(f"Cold-start import of {report['total_ms']} ms exceeds the {args.target_ms} ms target.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
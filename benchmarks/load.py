@@ -0,0 +1,338 @@
+"""
+Load test for /api/plan and /api/regenerate-event.
+
+By default the app and the local Gemini/Pexels stand-ins are started as separate processes,
+so results are reproducible and neither the load generator nor the stand-ins share the
+app's GIL or heap; memory growth is that of the app process alone. Use --target to drive
+an already running deployment instead (memory is then not reported).
+
+    python -m benchmarks.load --sessions 300 --concurrency 25 --hit-ratio 0.6 \
+        --output benchmarks/results/run.json --baseline benchmarks/results/previous.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.stand_ins import add_stand_in_arguments, stand_in_argv
+
+INTERESTS = ["Food", "History", "Art", "Music", "Nightlife", "Shopping"]
+MODES = ["surprise", "must-see"]
+
+
+def current_rss_bytes(pid: int) -> Optional[int]:
+    """Resident set size of process `pid` now, or None where /proc is not available."""
+    try:
+        with open(f"/proc/{pid}/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def percentile(ordered: List[float], fraction: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return ordered[min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.statuses: Dict[str, Dict[str, int]] = {}
+
+    def record(self, route: str, seconds: float, status: str):
+        self.latencies.setdefault(route, []).append(seconds)
+        route_statuses = self.statuses.setdefault(route, {})
+        route_statuses[status] = route_statuses.get(status, 0) + 1
+
+    def summary(self, elapsed: float) -> Dict[str, dict]:
+        routes = {}
+        for route, latencies in self.latencies.items():
+            ordered = sorted(latencies)
+            errors = sum(count for status, count in self.statuses[route].items() if not status.startswith("2"))
+            routes[route] = {
+                "requests": len(ordered),
+                "errors": errors,
+                "error_rate": round(errors / len(ordered), 4),
+                "requests_per_second": round(len(ordered) / elapsed, 2),
+                "mean_ms": round(1000 * sum(ordered) / len(ordered), 2),
+                "p50_ms": round(1000 * percentile(ordered, 0.50), 2),
+                "p95_ms": round(1000 * percentile(ordered, 0.95), 2),
+                "p99_ms": round(1000 * percentile(ordered, 0.99), 2),
+                "statuses": self.statuses[route],
+            }
+        return routes
+
+
+class MemorySampler:
+    """Samples the RSS of the app process (not this one) while the load runs."""
+
+    def __init__(self, pid: int, interval_seconds: float = 0.25):
+        self.pid = pid
+        self.interval_seconds = interval_seconds
+        self.start_bytes = current_rss_bytes(pid) or 0
+        self.peak_bytes = self.start_bytes
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        while True:
+            self.peak_bytes = max(self.peak_bytes, current_rss_bytes(self.pid) or 0)
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> Optional[dict]:
+        self._task.cancel()
+        end_bytes = current_rss_bytes(self.pid)
+        if end_bytes is None or not self.start_bytes:
+            return None
+        self.peak_bytes = max(self.peak_bytes, end_bytes)
+        mib = 1024 * 1024
+        return {
+            "rss_start_mib": round(self.start_bytes / mib, 2),
+            "rss_end_mib": round(end_bytes / mib, 2),
+            "rss_peak_mib": round(self.peak_bytes / mib, 2),
+            "rss_growth_mib": round((end_bytes - self.start_bytes) / mib, 2),
+        }
+
+
+class Workload:
+    """
+    Sessions draw preferences from a small popular set (cache hits once warm) with probability
+    `hit_ratio`, otherwise from the full space (mostly misses), then regenerate a few events.
+    """
+
+    def __init__(self, hit_ratio: float, popular_sets: int, regenerations: int, seed: Optional[int]):
+        self.random = random.Random(seed)
+        self.hit_ratio = hit_ratio
+        self.regenerations = regenerations
+        self.popular = [self._random_preferences() for _ in range(popular_sets)]
+
+    def _random_preferences(self) -> dict:
+        interests = self.random.sample(INTERESTS, self.random.randint(1, 3))
+        return {"budget": self.random.randrange(40, 301, 5), "interests": interests, "mode": self.random.choice(MODES)}
+
+    def preferences(self) -> dict:
+        if self.popular and self.random.random() < self.hit_ratio:
+            return dict(self.random.choice(self.popular))
+        return self._random_preferences()
+
+
+async def timed_post(client: httpx.AsyncClient, recorder: Recorder, route: str, path: str, body: dict) -> Optional[dict]:
+    started = time.perf_counter()
+    try:
+        response = await client.post(path, json=body)
+        status = str(response.status_code)
+    except httpx.HTTPError as e:
+        recorder.record(route, time.perf_counter() - started, type(e).__name__)
+        return None
+    recorder.record(route, time.perf_counter() - started, status)
+    return response.json() if response.is_success else None
+
+
+async def run_session(client: httpx.AsyncClient, recorder: Recorder, workload: Workload):
+    preferences = workload.preferences()
+    plan = await timed_post(client, recorder, "plan", "/api/plan", preferences)
+    if not plan:
+        return
+    for _ in range(workload.regenerations):
+        body = {
+            "current_plan": plan["plan"],
+            "event_index_to_replace": workload.random.randrange(len(plan["plan"])),
+            "user_preferences": preferences,
+            "outing_id": plan["outing_id"],
+        }
+        updated = await timed_post(client, recorder, "regenerate", "/api/regenerate-event", body)
+        if not updated:
+            return
+        plan = updated
+
+
+async def run_load(base_url: str, args: argparse.Namespace, app_pid: Optional[int]) -> dict:
+    workload = Workload(args.hit_ratio, args.popular_sets, args.regenerations, args.seed)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.request_timeout, limits=limits) as client:
+        # Warm the popular preference sets so they behave as steady-state cache hits.
+        await asyncio.gather(*(timed_post(client, Recorder(), "plan", "/api/plan", preferences) for preferences in workload.popular))
+
+        recorder = Recorder()
+        sampler = MemorySampler(app_pid) if app_pid is not None else None
+        if sampler:
+            sampler.start()
+        queue: asyncio.Queue = asyncio.Queue()
+        for _ in range(args.sessions):
+            queue.put_nowait(None)
+
+        async def worker():
+            while not queue.empty():
+                queue.get_nowait()
+                await run_session(client, recorder, workload)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+        memory = await sampler.stop() if sampler else None
+
+        app_stats = {}
+        for name in ("cache-stats", "upstream-stats"):
+            try:
+                response = await client.get(f"/api/{name}")
+                app_stats[name] = response.json() if response.is_success else None
+            except httpx.HTTPError:
+                app_stats[name] = None
+
+    total = sum(len(latencies) for latencies in recorder.latencies.values())
+    return {
+        "elapsed_seconds": round(elapsed, 3),
+        "requests": total,
+        "requests_per_second": round(total / elapsed, 2),
+        "routes": recorder.summary(elapsed),
+        "memory": memory,
+        "app_stats": app_stats,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Lists per-route regressions in throughput or tail latency beyond `tolerance` (a fraction)."""
+    regressions = []
+    for route, current in results["routes"].items():
+        previous = baseline.get("routes", {}).get(route)
+        if not previous:
+            continue
+        if current["requests_per_second"] < previous["requests_per_second"] * (1 - tolerance):
+            regressions.append(f"{route}: req/s {previous['requests_per_second']} -> {current['requests_per_second']}")
+        for key in ("p95_ms", "p99_ms"):
+            if current[key] > previous[key] * (1 + tolerance):
+                regressions.append(f"{route}: {key} {previous[key]} -> {current[key]}")
+    return regressions
+
+
+class ChildServer:
+    """Runs `python -m <module> ...` as its own process and waits until `ready_url` answers."""
+
+    def __init__(self, name: str, argv: List[str], ready_url: str, env: Optional[Dict[str, str]] = None):
+        self.name = name
+        self.argv = argv
+        self.ready_url = ready_url
+        self.env = env
+        self.process: Optional[subprocess.Popen] = None
+
+    def start(self, timeout: float = 30.0) -> "ChildServer":
+        self.process = subprocess.Popen([sys.executable, "-m", *self.argv], env=self.env)
+        deadline = time.monotonic() + timeout
+        while True:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"{self.name} exited with code {self.process.returncode} before it was ready.")
+            try:
+                # Any HTTP response, even a 404, means the server is accepting requests.
+                httpx.get(self.ready_url, timeout=1.0)
+                return self
+            except httpx.HTTPError:
+                if time.monotonic() > deadline:
+                    self.stop()
+                    raise RuntimeError(f"{self.name} did not start on {self.ready_url}.")
+                time.sleep(0.1)
+
+    def stop(self):
+        if self.process is None or self.process.poll() is not None:
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10.0)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+def start_local_app(args: argparse.Namespace, work_dir: str) -> List[ChildServer]:
+    """Starts the stand-ins and the app (pointed at them through its env) as separate processes."""
+    host = "127.0.0.1"
+    gemini_url, pexels_url, app_url = (f"http://{host}:{port}" for port in (args.gemini_port, args.pexels_port, args.app_port))
+    stand_ins = ChildServer(
+        "stand-ins",
+        ["benchmarks.stand_ins", "--gemini-port", str(args.gemini_port), "--pexels-port", str(args.pexels_port), *stand_in_argv(args)],
+        pexels_url,
+    ).start()
+    servers = [stand_ins]
+    env = {
+        **os.environ,
+        "GEMINI_BASE_URL": gemini_url,
+        "PEXELS_BASE_URL": pexels_url,
+        "GOOGLE_API_KEY": os.getenv("GOOGLE_API_KEY", "stand-in"),
+        "PEXELS_API_KEY": os.getenv("PEXELS_API_KEY", "stand-in"),
+        "IMAGE_CACHE_FILE": os.path.join(work_dir, "learned_images.db"),
+        "CACHE_SQLITE_PATH": os.path.join(work_dir, "cache.db"),
+        "LEARNED_SPOTS_FILE": os.path.join(work_dir, "learned_spots.db"),
+    }
+    for assignment in args.app_env:
+        key, _, value = assignment.partition("=")
+        env[key] = value
+    try:
+        servers.append(ChildServer("app", ["uvicorn", "api.index:app", "--host", host, "--port", str(args.app_port), "--log-level", "warning"], f"{app_url}/api", env).start())
+    except Exception:
+        stand_ins.stop()
+        raise
+    return servers
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the OneStopOutings API.")
+    parser.add_argument("--target", help="Base URL of a running app; by default the app is started in its own process against stand-ins.")
+    parser.add_argument("--sessions", type=int, default=200, help="Plan requests to issue, each followed by its regenerations.")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--hit-ratio", type=float, default=0.5, help="Share of sessions using a popular (cached) preference set.")
+    parser.add_argument("--popular-sets", type=int, default=10)
+    parser.add_argument("--regenerations", type=int, default=2, help="Regenerations per session.")
+    parser.add_argument("--request-timeout", type=float, default=60.0)
+    parser.add_argument("--app-port", type=int, default=8100)
+    parser.add_argument("--gemini-port", type=int, default=8101)
+    parser.add_argument("--pexels-port", type=int, default=8102)
+    parser.add_argument("--app-env", action="append", default=[], metavar="KEY=VALUE", help="Extra env for the local app process, e.g. PLAN_STRATEGY=local-first.")
+    parser.add_argument("--output", help="Write JSON results here.")
+    parser.add_argument("--baseline", help="Earlier results JSON to compare against; exits 1 on regression.")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    add_stand_in_arguments(parser)
+    args = parser.parse_args()
+
+    servers: List[ChildServer] = []
+    with tempfile.TemporaryDirectory(prefix="onestop-bench-") as work_dir:
+        try:
+            if args.target:
+                base_url, app_pid = args.target, None
+            else:
+                servers = start_local_app(args, work_dir)
+                base_url, app_pid = f"http://127.0.0.1:{args.app_port}", servers[-1].process.pid
+            results = asyncio.run(run_load(base_url, args, app_pid))
+        finally:
+            for server in reversed(servers):
+                server.stop()
+
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "baseline")}
+    results = {"timestamp": datetime.now(timezone.utc).isoformat(), "config": config, **results}
+    print(json.dumps({key: results[key] for key in ("requests", "requests_per_second", "routes", "memory")}, indent=2))
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Local stand-ins for the Gemini and Pexels APIs, so /api/plan and /api/regenerate-event
+can be load-tested without spending real quota.
+
+Point the app at them with GEMINI_BASE_URL / PEXELS_BASE_URL. Run standalone with:
+
+    python -m benchmarks.stand_ins --gemini-port 8101 --pexels-port 8102
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+ADJECTIVES = ["Hidden", "Old", "Little", "Secret", "Quiet", "Crooked", "Golden", "Merry", "Rusty", "Velvet"]
+NOUNS = {
+    "Breakfast": ["Bakery", "Café", "Kitchen"],
+    "Lunch": ["Deli", "Bistro", "Food Market"],
+    "Dinner": ["Brasserie", "Supper Club", "Tavern"],
+    "Activity": ["Gallery", "Garden", "Walking Tour"],
+    "Museum": ["Museum", "Archive", "Collection"],
+    "Pub": ["Pub", "Snug", "Bar"],
+}
+
+
+class StandInConfig:
+    """Latency is log-normal around `median_ms`; `shapes` weights how Gemini formats its JSON."""
+
+    def __init__(self, median_ms: float = 800.0, sigma: float = 0.5, error_rate: float = 0.0, shapes: Optional[Dict[str, float]] = None, venue_pool: int = 500, seed: Optional[int] = None):
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.shapes = shapes or {"clean": 1.0}
+        self.venue_pool = venue_pool
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+
+    def latency_seconds(self) -> float:
+        if self.median_ms <= 0:
+            return 0.0
+        return self.random.lognormvariate(0.0, self.sigma) * self.median_ms / 1000.0
+
+    def should_fail(self) -> bool:
+        return self.random.random() < self.error_rate
+
+    def shape(self) -> str:
+        names = list(self.shapes)
+        return self.random.choices(names, weights=[self.shapes[name] for name in names])[0]
+
+
+def _fake_event(config: StandInConfig, event_type: str) -> dict:
+    venue_id = config.random.randrange(config.venue_pool)
+    noun = config.random.choice(NOUNS.get(event_type, NOUNS["Activity"]))
+    return {
+        "type": event_type,
+        "name": f"The {ADJECTIVES[venue_id % len(ADJECTIVES)]} {noun} #{venue_id}",
+        "cost": config.random.choice([0, 5, 10, 15, 20, 25, 35, 50]),
+        "duration": config.random.choice([45, 60, 90, 120, 150]),
+    }
+
+
+def _fake_response_value(config: StandInConfig, prompt: str):
+    """Answers in the shape each of the app's prompts asks for: one event, a batch, alternatives per slot, or a plan."""
+    if "replace one event" in prompt:
+        return _fake_event(config, config.random.choice(list(NOUNS)))
+    batch = re.search(r"wants to replace (\d+) events", prompt)
+    if batch:
+        slot_types = re.findall(r"^\s*\d+\. ([^:\n]+):", prompt, flags=re.MULTILINE)
+        return [_fake_event(config, event_type) for event_type in slot_types[:int(batch.group(1))]]
+    per_slot = re.search(r"suggest (\d+) different alternative events", prompt)
+    if per_slot:
+        slot_types = re.findall(r"^\s*\d+\. ([^:\n]+):", prompt, flags=re.MULTILINE)
+        return [[_fake_event(config, event_type) for _ in range(int(per_slot.group(1)))] for event_type in slot_types]
+    return [_fake_event(config, event_type) for event_type in ("Breakfast", "Activity", "Dinner")]
+
+
+def _render(value, shape: str) -> str:
+    text = json.dumps(value, indent=2)
+    if shape == "fenced":
+        return f"```json\n{text}\n```"
+    if shape == "malformed":
+        return text[: len(text) // 2]
+    if shape == "prose":
+        return f"Here is your plan:\n{text}\nEnjoy Dublin!"
+    return text
+
+
+def create_gemini_app(config: StandInConfig) -> FastAPI:
+    app = FastAPI()
+
+    def _prompt(body: dict) -> str:
+        return body["contents"][0]["parts"][0]["text"]
+
+    @app.post("/v1beta/models/{model_action}")
+    async def generate(model_action: str, request: Request):
+        config.requests += 1
+        body = await request.json()
+        await asyncio.sleep(config.latency_seconds())
+        if config.should_fail():
+            config.errors += 1
+            return JSONResponse({"error": {"code": 503, "message": "stand-in failure"}}, status_code=503)
+        text = _render(_fake_response_value(config, _prompt(body)), config.shape())
+
+        if model_action.endswith(":streamGenerateContent"):
+            async def sse():
+                step = max(len(text) // 8, 1)
+                for start in range(0, len(text), step):
+                    chunk = {"candidates": [{"content": {"parts": [{"text": text[start:start + step]}]}}]}
+                    yield f"data: {json.dumps(chunk)}\r\n\r\n"
+                    await asyncio.sleep(config.latency_seconds() / 8)
+            return StreamingResponse(sse(), media_type="text/event-stream")
+        return {"candidates": [{"content": {"parts": [{"text": text}]}}]}
+
+    return app
+
+
+def create_pexels_app(config: StandInConfig, empty_rate: float = 0.1) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/v1/search")
+    async def search(query: str, per_page: int = 1):
+        config.requests += 1
+        await asyncio.sleep(config.latency_seconds())
+        if config.should_fail():
+            config.errors += 1
+            return JSONResponse({"error": "stand-in failure"}, status_code=500)
+        if config.random.random() < empty_rate:
+            return {"photos": []}
+        photo_id = abs(hash(query)) % 10_000_000
+        return {"photos": [{"id": photo_id, "src": {"tiny": f"https://images.example/{photo_id}/tiny.jpg"}}]}
+
+    return app
+
+
+class BackgroundServer:
+    """Runs an ASGI app under uvicorn on its own thread and event loop."""
+
+    def __init__(self, app: FastAPI, port: int, host: str = "127.0.0.1"):
+        self.server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning", lifespan="on"))
+        self.url = f"http://{host}:{port}"
+        self._thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def start(self, timeout: float = 10.0) -> "BackgroundServer":
+        self._thread.start()
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError(f"Server on {self.url} did not start.")
+            time.sleep(0.05)
+        return self
+
+    def stop(self):
+        self.server.should_exit = True
+        self._thread.join(timeout=10.0)
+
+
+def parse_shapes(spec: str) -> Dict[str, float]:
+    """Parses "clean=0.7,fenced=0.2,malformed=0.1" into shape weights."""
+    shapes: Dict[str, float] = {}
+    for item in spec.split(","):
+        name, _, weight = item.partition("=")
+        shapes[name.strip()] = float(weight or 1.0)
+    return shapes
+
+
+def add_stand_in_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--gemini-median-ms", type=float, default=800.0)
+    parser.add_argument("--gemini-sigma", type=float, default=0.5)
+    parser.add_argument("--gemini-error-rate", type=float, default=0.02)
+    parser.add_argument("--gemini-shapes", default="clean=0.6,fenced=0.3,malformed=0.05,prose=0.05")
+    parser.add_argument("--venue-pool", type=int, default=500)
+    parser.add_argument("--pexels-median-ms", type=float, default=150.0)
+    parser.add_argument("--pexels-sigma", type=float, default=0.4)
+    parser.add_argument("--pexels-error-rate", type=float, default=0.01)
+    parser.add_argument("--pexels-empty-rate", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def stand_in_argv(args: argparse.Namespace) -> List[str]:
+    """Turns the options added by `add_stand_in_arguments` back into command-line arguments."""
+    argv: List[str] = []
+    for option in ("gemini_median_ms", "gemini_sigma", "gemini_error_rate", "gemini_shapes", "venue_pool", "pexels_median_ms", "pexels_sigma", "pexels_error_rate", "pexels_empty_rate", "seed"):
+        value = getattr(args, option)
+        if value is not None:
+            argv += ["--" + option.replace("_", "-"), str(value)]
+    return argv
+
+
+def configs_from_args(args: argparse.Namespace) -> List[StandInConfig]:
+    gemini = StandInConfig(args.gemini_median_ms, args.gemini_sigma, args.gemini_error_rate, parse_shapes(args.gemini_shapes), args.venue_pool, args.seed)
+    pexels = StandInConfig(args.pexels_median_ms, args.pexels_sigma, args.pexels_error_rate, seed=args.seed)
+    return [gemini, pexels]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run local Gemini and Pexels stand-ins.")
+    parser.add_argument("--gemini-port", type=int, default=8101)
+    parser.add_argument("--pexels-port", type=int, default=8102)
+    add_stand_in_arguments(parser)
+    args = parser.parse_args()
+    gemini, pexels = configs_from_args(args)
+    servers = [BackgroundServer(create_gemini_app(gemini), args.gemini_port).start(), BackgroundServer(create_pexels_app(pexels, args.pexels_empty_rate), args.pexels_port).start()]
+    print(f"GEMINI_BASE_URL={servers[0].url}\nPEXELS_BASE_URL={servers[1].url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        for server in servers:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import asyncio
+import threading
+import unittest
+
+from backend.utils.batch_flusher import BatchFlusher
+
+
+class FakeStore:
+    def __init__(self):
+        self.pending = 0
+        self.flushed = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def flush(self) -> int:
+        self.started.set()
+        self.release.wait(5)
+        batch, self.pending = self.pending, 0
+        if batch:
+            self.flushed.append(batch)
+        return batch
+
+
+class BatchFlusherTest(unittest.IsolatedAsyncioTestCase):
+    async def test_batches_writes_until_the_interval(self):
+        store = FakeStore()
+        flusher = BatchFlusher(store.flush, lambda: store.pending, flush_interval_seconds=0.05, max_pending=100)
+        for _ in range(3):
+            store.pending += 1
+            flusher.schedule()
+        await asyncio.sleep(0.1)
+        self.assertEqual(store.flushed, [3])
+
+    async def test_full_buffer_flushes_immediately(self):
+        store = FakeStore()
+        flusher = BatchFlusher(store.flush, lambda: store.pending, flush_interval_seconds=60, max_pending=2)
+        store.pending = 1
+        flusher.schedule()
+        store.pending = 2
+        flusher.schedule()
+        await asyncio.sleep(0.05)
+        self.assertEqual(store.flushed, [2])
+        await flusher.aclose()
+
+    async def test_aclose_waits_for_running_flushes(self):
+        store = FakeStore()
+        flusher = BatchFlusher(store.flush, lambda: store.pending, flush_interval_seconds=60, max_pending=2)
+        store.pending = 1
+        flusher.schedule()
+        store.release.clear()
+        store.pending = 2
+        flusher.schedule()
+        await asyncio.to_thread(store.started.wait, 5)
+        store.pending = 3
+        flusher.schedule()
+        closing = asyncio.create_task(flusher.aclose())
+        await asyncio.sleep(0.05)
+        self.assertFalse(closing.done())
+        store.release.set()
+        await closing
+        self.assertEqual(sum(store.flushed), 3)
+        self.assertFalse(flusher._tasks)
+
+    async def test_no_flush_is_scheduled_after_close(self):
+        store = FakeStore()
+        flusher = BatchFlusher(store.flush, lambda: store.pending, flush_interval_seconds=0.01)
+        await flusher.aclose()
+        store.pending = 1
+        flusher.schedule()
+        await asyncio.sleep(0.05)
+        self.assertEqual(store.flushed, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+import os
+import tempfile
+import unittest
+
+from backend.utils.cache import CacheBackend, MemoryCacheBackend, SQLiteCacheBackend
+
+
+class CacheBackendContract:
+    """Behaviour every CacheBackend must share; mixed into one TestCase per backend."""
+
+    def make_cache(self, max_entries: int = 10, default_ttl_seconds: float = 60) -> CacheBackend:
+        raise NotImplementedError
+
+    def enforce_bound(self, cache: CacheBackend):
+        """Backends may enforce max_entries lazily; make them do it now."""
+
+    def test_missing_key_is_a_miss(self):
+        cache = self.make_cache()
+        self.assertIsNone(cache.get("missing"))
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+    def test_set_then_get(self):
+        cache = self.make_cache()
+        cache.set("plan", {"events": ["a", "b"]})
+        self.assertEqual(cache.get("plan"), {"events": ["a", "b"]})
+        self.assertEqual(cache.hits, 1)
+
+    def test_expired_entry_is_not_served(self):
+        cache = self.make_cache()
+        cache.set("plan", "stale", ttl_seconds=-1)
+        self.assertIsNone(cache.get("plan"))
+        self.assertIsNone(cache.expires_in("plan"))
+
+    def test_expires_in_counts_down_from_the_ttl(self):
+        cache = self.make_cache(default_ttl_seconds=60)
+        cache.set("plan", "fresh")
+        self.assertGreater(cache.expires_in("plan"), 59)
+        self.assertLessEqual(cache.expires_in("plan"), 60)
+        self.assertIsNone(cache.expires_in("missing"))
+
+    def test_incr_starts_missing_and_expired_keys_at_zero(self):
+        cache = self.make_cache()
+        self.assertEqual(cache.incr("count"), 1)
+        self.assertEqual(cache.incr("count", amount=2), 3)
+        cache.set("count", 7, ttl_seconds=-1)
+        self.assertEqual(cache.incr("count"), 1)
+
+    def test_delete(self):
+        cache = self.make_cache()
+        cache.set("plan", "value")
+        cache.delete("plan")
+        self.assertIsNone(cache.get("plan"))
+
+    def test_sweep_removes_expired_entries(self):
+        cache = self.make_cache()
+        cache.set("old", "value", ttl_seconds=-1)
+        cache.set("new", "value")
+        self.assertEqual(cache.sweep(), 1)
+        self.assertEqual(cache.size(), 1)
+        self.assertEqual(cache.expirations, 1)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = self.make_cache(max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.set("c", 3)
+        self.enforce_bound(cache)
+        self.assertEqual(cache.size(), 2)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual((cache.get("a"), cache.get("c")), (1, 3))
+        self.assertEqual(cache.evictions, 1)
+
+
+class MemoryCacheBackendTest(CacheBackendContract, unittest.TestCase):
+    def make_cache(self, max_entries=10, default_ttl_seconds=60):
+        return MemoryCacheBackend("test", max_entries, default_ttl_seconds)
+
+    def test_expired_entry_is_dropped_on_read(self):
+        cache = self.make_cache()
+        cache.set("plan", "stale", ttl_seconds=-1)
+        cache.get("plan")
+        self.assertEqual((cache.size(), cache.expirations), (0, 1))
+
+
+class SQLiteCacheBackendTest(CacheBackendContract, unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "cache.db")
+
+    def make_cache(self, max_entries=10, default_ttl_seconds=60, name="test"):
+        cache = SQLiteCacheBackend(name, max_entries, default_ttl_seconds, self.path)
+        self.addCleanup(cache.close)
+        return cache
+
+    def enforce_bound(self, cache):
+        # The size bound is checked every 64 writes, and on every sweep.
+        cache.sweep()
+
+    def test_entries_are_shared_through_the_file(self):
+        writer = self.make_cache()
+        reader = self.make_cache()
+        writer.set("plan", [1, 2])
+        self.assertEqual(reader.get("plan"), [1, 2])
+        self.assertEqual(reader.incr("count"), 1)
+        self.assertEqual(writer.incr("count"), 2)
+
+    def test_caches_use_separate_tables(self):
+        plans = self.make_cache(name="plans")
+        sessions = self.make_cache(name="sessions")
+        plans.set("key", "plan")
+        self.assertIsNone(sessions.get("key"))
+
+    def test_rejects_names_that_are_not_identifiers(self):
+        with self.assertRaises(ValueError):
+            SQLiteCacheBackend("plans; DROP TABLE x", 10, 60, self.path)
+
+    async def test_async_writes(self):
+        cache = self.make_cache()
+        await cache.aset("plan", "value")
+        self.assertEqual(await cache.aincr("count", amount=3), 3)
+        self.assertEqual((cache.get("plan"), cache.get("count")), ("value", 3))
+
+
+class CacheBackendInterfaceTest(unittest.TestCase):
+    def test_incomplete_backend_cannot_be_created(self):
+        class GetOnly(CacheBackend):
+            def get(self, key):
+                return None
+
+        with self.assertRaises(TypeError):
+            GetOnly("test", 10, 60)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+
+from backend.model.models import Event, UserPreferences
+from backend.utils.cache_keys import DEFAULT_BUDGET_BANDS, CacheKeyBuilder, canonical_preferences, parse_budget_bands
+
+
+def preferences(budget: int, interests=("food",), mode="standard") -> UserPreferences:
+    return UserPreferences(budget=budget, interests=list(interests), mode=mode)
+
+
+class BudgetBandTest(unittest.TestCase):
+    def setUp(self):
+        self.keys = CacheKeyBuilder(budget_bands=(50, 100, 200))
+
+    def test_band_includes_its_upper_edge(self):
+        self.assertEqual(self.keys.budget_band(50), "0-50")
+        self.assertEqual(self.keys.budget_band(51), "50-100")
+        self.assertEqual(self.keys.budget_band(100), "50-100")
+        self.assertEqual(self.keys.budget_band(101), "100-200")
+
+    def test_bands_start_at_zero_and_end_open(self):
+        self.assertEqual(self.keys.budget_band(0), "0-50")
+        self.assertEqual(self.keys.budget_band(200), "100-200")
+        self.assertEqual(self.keys.budget_band(201), "200-max")
+
+    def test_budgets_in_one_band_share_a_plan_key(self):
+        self.assertEqual(self.keys.plan_key(preferences(51)), self.keys.plan_key(preferences(100)))
+        self.assertNotEqual(self.keys.plan_key(preferences(100)), self.keys.plan_key(preferences(101)))
+
+    def test_plan_fits_checks_the_exact_budget(self):
+        plan = {"total_cost": 80}
+        self.assertTrue(CacheKeyBuilder.plan_fits(plan, preferences(80)))
+        self.assertFalse(CacheKeyBuilder.plan_fits(plan, preferences(79)))
+        # 79 and 80 share a band, so the key alone would have served the plan.
+        self.assertEqual(self.keys.plan_key(preferences(79)), self.keys.plan_key(preferences(80)))
+
+    def test_parse_budget_bands(self):
+        self.assertEqual(parse_budget_bands("100, 50,,50"), (50, 100))
+        self.assertEqual(parse_budget_bands(None), DEFAULT_BUDGET_BANDS)
+
+
+class CanonicalPreferencesTest(unittest.TestCase):
+    def test_spellings_of_the_same_request_share_a_key(self):
+        keys = CacheKeyBuilder()
+        first = canonical_preferences(preferences(60, ["Live  Music", "foodie"], " Standard "))
+        second = canonical_preferences(preferences(60, ["food", "gigs", "FOOD"], "standard"))
+        self.assertEqual(first.interests, ["Food", "Music"])
+        self.assertEqual(first.mode, "standard")
+        self.assertEqual(keys.plan_key(first), keys.plan_key(second))
+
+    def test_blank_interests_are_dropped(self):
+        self.assertEqual(canonical_preferences(preferences(60, ["", "  ", "art"])).interests, ["Art"])
+
+
+class ReplacementFitsTest(unittest.TestCase):
+    def setUp(self):
+        self.plan = [
+            Event(type="Museum", name="National Gallery", cost=0, duration=90),
+            Event(type="Pub", name="The Long Hall", cost=15, duration=60),
+        ]
+
+    def test_rejects_a_venue_already_in_the_plan(self):
+        self.assertFalse(CacheKeyBuilder.replacement_fits({"name": "the long  hall"}, self.plan, 0))
+
+    def test_rejects_the_replaced_venue_itself(self):
+        self.assertFalse(CacheKeyBuilder.replacement_fits({"name": "National Gallery"}, self.plan, 0))
+
+    def test_accepts_a_new_venue(self):
+        self.assertTrue(CacheKeyBuilder.replacement_fits({"name": "Hugh Lane Gallery"}, self.plan, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import json
+import unittest
+
+from backend.utils.json_stream import JsonArrayStreamParser
+
+EVENTS = [
+    {"name": "Guinness Storehouse", "type": "Activity", "cost": 26, "duration": 120},
+    {"name": "The \"Brazen\" Head {est. 1198}", "type": "Pub", "cost": 15, "duration": 60},
+    {"name": "Chapter One", "type": "Dinner", "cost": 90, "duration": 120, "tags": {"michelin": True}},
+]
+TEXT = "```json\n" + json.dumps(EVENTS, indent=2) + "\n```"
+
+
+def parse(chunks):
+    parser = JsonArrayStreamParser()
+    objects = []
+    for chunk in chunks:
+        objects += parser.feed(chunk)
+    return objects
+
+
+class JsonArrayStreamParserTest(unittest.TestCase):
+    def test_parses_a_fenced_array_in_one_chunk(self):
+        self.assertEqual(parse([TEXT]), EVENTS)
+
+    def test_parses_the_same_objects_for_every_split_point(self):
+        for split in range(len(TEXT) + 1):
+            with self.subTest(split=split):
+                self.assertEqual(parse([TEXT[:split], TEXT[split:]]), EVENTS)
+
+    def test_parses_one_character_at_a_time(self):
+        self.assertEqual(parse(TEXT), EVENTS)
+
+    def test_returns_each_object_as_soon_as_it_closes(self):
+        parser = JsonArrayStreamParser()
+        first = json.dumps(EVENTS[0])
+        self.assertEqual(parser.feed("[" + first[:-1]), [])
+        self.assertEqual(parser.feed(first[-1:] + ", "), [EVENTS[0]])
+
+    def test_escaped_quote_split_from_its_backslash(self):
+        text = json.dumps([{"name": 'say "hi"'}])
+        split = text.index("\\") + 1
+        self.assertEqual(parse([text[:split], text[split:]]), [{"name": 'say "hi"'}])
+
+    def test_ignores_braces_before_the_array(self):
+        self.assertEqual(parse(['Here is {your} plan: [{"name": "A"}]']), [{"name": "A"}])
+
+    def test_skips_malformed_objects(self):
+        with self.assertLogs(level="WARNING"):
+            objects = parse(['[{"name": "A"}, {"name": B}, {"name": "C"}]'])
+        self.assertEqual(objects, [{"name": "A"}, {"name": "C"}])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,198 @@
+import asyncio
+import unittest
+from contextlib import aclosing
+
+from backend.utils.resilience import CircuitBreaker, CircuitOpenError, DeadlineExceededError, QueueFullError, ResilientCaller
+
+
+async def succeed():
+    return "ok"
+
+
+async def fail():
+    raise ValueError("upstream error")
+
+
+async def sleep_forever():
+    await asyncio.sleep(60)
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout_seconds=60)
+        for _ in range(2):
+            breaker.record_failure()
+        self.assertEqual(breaker.state, "closed")
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "open")
+        self.assertFalse(breaker.allow())
+        self.assertEqual(breaker.times_opened, 1)
+
+    def test_success_resets_failure_count(self):
+        breaker = CircuitBreaker(failure_threshold=2)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "closed")
+
+    def test_half_open_lets_a_single_probe_through(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout_seconds=0)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, "half-open")
+        self.assertFalse(breaker.allow())
+
+    def test_probe_success_closes(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout_seconds=0)
+        breaker.record_failure()
+        breaker.allow()
+        breaker.record_success()
+        self.assertEqual(breaker.state, "closed")
+        self.assertTrue(breaker.allow())
+
+    def test_probe_failure_reopens(self):
+        breaker = CircuitBreaker(failure_threshold=5, reset_timeout_seconds=60)
+        for _ in range(5):
+            breaker.record_failure()
+        breaker.opened_at -= 60
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "open")
+        self.assertFalse(breaker.allow())
+
+    def test_released_probe_can_be_retried(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout_seconds=0)
+        breaker.record_failure()
+        breaker.allow()
+        breaker.release_probe()
+        self.assertTrue(breaker.allow())
+
+
+class ResilientCallerTest(unittest.IsolatedAsyncioTestCase):
+    async def test_call_records_success_and_failure(self):
+        caller = ResilientCaller("test")
+        self.assertEqual(await caller.call(succeed), "ok")
+        with self.assertRaises(ValueError):
+            await caller.call(fail)
+        self.assertEqual((caller.successes, caller.failures, caller.in_flight), (1, 1, 0))
+
+    async def test_call_deadline_counts_as_failure(self):
+        caller = ResilientCaller("test", breaker=CircuitBreaker(failure_threshold=1))
+        with self.assertRaises(DeadlineExceededError):
+            await caller.call(sleep_forever, deadline_seconds=0.01)
+        self.assertEqual(caller.deadline_exceeded, 1)
+        self.assertEqual(caller.breaker.state, "open")
+        with self.assertRaises(CircuitOpenError):
+            await caller.call(succeed)
+        self.assertEqual(caller.rejected_open, 1)
+
+    async def test_queue_wait_counts_against_deadline(self):
+        caller = ResilientCaller("test", max_concurrency=1)
+        blocker = asyncio.create_task(caller.call(sleep_forever, deadline_seconds=1))
+        await asyncio.sleep(0)
+        with self.assertRaises(DeadlineExceededError):
+            await caller.call(succeed, deadline_seconds=0.01)
+        blocker.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await blocker
+        self.assertEqual((caller.in_flight, caller.waiting), (0, 0))
+
+    async def test_rejects_when_queue_is_full(self):
+        caller = ResilientCaller("test", max_concurrency=1, max_queue=0)
+        blocker = asyncio.create_task(caller.call(sleep_forever, deadline_seconds=1))
+        await asyncio.sleep(0)
+        with self.assertRaises(QueueFullError):
+            await caller.call(succeed)
+        self.assertEqual(caller.rejected_queue_full, 1)
+        blocker.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await blocker
+
+    async def test_hedge_wins_when_first_attempt_is_slow(self):
+        caller = ResilientCaller("test", hedging=True, min_hedge_delay_seconds=0.01)
+        caller._latencies.extend([0.01] * 20)
+        attempts = []
+
+        async def work():
+            attempts.append(1)
+            if len(attempts) == 1:
+                await sleep_forever()
+            return "hedged"
+
+        self.assertEqual(await caller.call(work, deadline_seconds=1), "hedged")
+        self.assertEqual((caller.hedges_fired, caller.hedges_won), (1, 1))
+        self.assertFalse(caller._semaphore.locked())
+
+    async def test_no_hedge_without_latency_history(self):
+        caller = ResilientCaller("test", hedging=True, min_hedge_delay_seconds=0.01)
+        with self.assertRaises(DeadlineExceededError):
+            await caller.call(sleep_forever, deadline_seconds=0.05)
+        self.assertEqual(caller.hedges_fired, 0)
+
+
+class ResilientStreamTest(unittest.IsolatedAsyncioTestCase):
+    def half_open_caller(self) -> ResilientCaller:
+        caller = ResilientCaller("test", breaker=CircuitBreaker(failure_threshold=1, reset_timeout_seconds=0))
+        caller.breaker.record_failure()
+        return caller
+
+    async def test_stream_yields_chunks_and_records_success(self):
+        caller = self.half_open_caller()
+
+        async def chunks():
+            yield "a"
+            yield "b"
+
+        self.assertEqual([chunk async for chunk in caller.stream(chunks)], ["a", "b"])
+        self.assertEqual(caller.breaker.state, "closed")
+
+    async def test_stream_deadline_counts_as_failure(self):
+        caller = ResilientCaller("test", breaker=CircuitBreaker(failure_threshold=1))
+
+        async def chunks():
+            yield "a"
+            await sleep_forever()
+            yield "b"
+
+        received = []
+        with self.assertRaises(DeadlineExceededError):
+            async for chunk in caller.stream(chunks, deadline_seconds=0.05):
+                received.append(chunk)
+        self.assertEqual(received, ["a"])
+        self.assertEqual(caller.deadline_exceeded, 1)
+        self.assertEqual(caller.breaker.state, "open")
+        self.assertEqual(caller.in_flight, 0)
+
+    async def test_stream_closed_early_releases_probe(self):
+        caller = self.half_open_caller()
+
+        async def chunks():
+            yield "a"
+            yield "b"
+
+        with self.assertRaises(ValueError):
+            async with aclosing(caller.stream(chunks)) as stream:
+                async for _ in stream:
+                    raise ValueError("consumer failed")
+        self.assertEqual(caller.breaker.state, "half-open")
+        self.assertEqual(caller.in_flight, 0)
+        self.assertEqual(await caller.call(succeed), "ok")
+        self.assertEqual(caller.breaker.state, "closed")
+
+    async def test_slot_closed_by_generator_exit_releases_probe(self):
+        caller = self.half_open_caller()
+
+        async def guarded():
+            async with caller.slot():
+                yield "a"
+                yield "b"
+
+        stream = guarded()
+        await anext(stream)
+        await stream.aclose()
+        self.assertEqual(caller.breaker.state, "half-open")
+        self.assertTrue(caller.breaker.allow())
+
+
+if __name__ == "__main__":
+    unittest.main()
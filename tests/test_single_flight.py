@@ -0,0 +1,104 @@
+import asyncio
+import unittest
+
+from backend.utils.single_flight import SingleFlight
+
+
+class GatedWork:
+    """Work that blocks until released, counting how many times it actually ran."""
+
+    def __init__(self, result="plan", error=None):
+        self.result = result
+        self.error = error
+        self.runs = 0
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.runs += 1
+        self.started.set()
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class SingleFlightTest(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_calls_share_one_run(self):
+        flight = SingleFlight()
+        work = GatedWork()
+        callers = [asyncio.create_task(flight.do("key", work)) for _ in range(3)]
+        await work.started.wait()
+        self.assertTrue(flight.in_flight("key"))
+        work.release.set()
+        self.assertEqual(await asyncio.gather(*callers), ["plan"] * 3)
+        self.assertEqual(work.runs, 1)
+        self.assertEqual(flight.stats(), {"leaders": 1, "coalesced": 2, "in_flight": 0})
+
+    async def test_different_keys_run_separately(self):
+        flight = SingleFlight()
+        work = GatedWork()
+        work.release.set()
+        await asyncio.gather(flight.do("a", work), flight.do("b", work))
+        self.assertEqual(work.runs, 2)
+
+    async def test_key_is_released_after_completion(self):
+        flight = SingleFlight()
+        work = GatedWork()
+        work.release.set()
+        await flight.do("key", work)
+        self.assertFalse(flight.in_flight("key"))
+        await flight.do("key", work)
+        self.assertEqual(work.runs, 2)
+
+    async def test_every_caller_gets_the_shared_exception(self):
+        flight = SingleFlight()
+        error = ValueError("upstream error")
+        work = GatedWork(error=error)
+        callers = [asyncio.create_task(flight.do("key", work)) for _ in range(2)]
+        await work.started.wait()
+        work.release.set()
+        results = await asyncio.gather(*callers, return_exceptions=True)
+        self.assertIs(results[0], error)
+        self.assertIs(results[1], error)
+        self.assertFalse(flight.in_flight("key"))
+
+    async def test_cancelled_caller_does_not_cancel_the_work(self):
+        flight = SingleFlight()
+        work = GatedWork()
+        leader = asyncio.create_task(flight.do("key", work))
+        follower = asyncio.create_task(flight.do("key", work))
+        await work.started.wait()
+        leader.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await leader
+        work.release.set()
+        self.assertEqual(await follower, "plan")
+        self.assertEqual(work.runs, 1)
+
+    async def test_work_finishes_after_every_caller_is_cancelled(self):
+        flight = SingleFlight()
+        work = GatedWork(error=ValueError("nobody is listening"))
+        caller = asyncio.create_task(flight.do("key", work))
+        await work.started.wait()
+        caller.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await caller
+        self.assertTrue(flight.in_flight("key"))
+        work.release.set()
+        while flight.in_flight("key"):
+            await asyncio.sleep(0)
+
+    async def test_aclose_cancels_work_in_flight(self):
+        flight = SingleFlight()
+        work = GatedWork()
+        caller = asyncio.create_task(flight.do("key", work))
+        await work.started.wait()
+        await flight.aclose()
+        with self.assertRaises(asyncio.CancelledError):
+            await caller
+        self.assertFalse(flight.in_flight("key"))
+
+
+if __name__ == "__main__":
+    unittest.main()